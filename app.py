@@ -1,14 +1,61 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request, Response, g, send_file, stream_with_context
 from flask_restful import Api, Resource
 import subprocess
+import threading
+import heapq
+import itertools
+import time
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 import json
 import pandas as pd
 import utils.utilfunctions as utilfunctions
 import utils.statsitcs as statistics
+import utils.query as query
+import utils.rollups as rollups
+import utils.metrics as metrics
+import utils.profiling as profiling
+import utils.throttle as throttle
+import utils.workers as workers
+import utils.chunkstore as chunkstore
+import utils.checkpoint as checkpoint
+import utils.sentiment as sentiment
 
 #All dataframes
 df_dict = {}
+#Query indexes over the dataframes, keyed like df_dict
+index_dict = {}
+#Activity rollup tables, keyed like df_dict
+rollup_dict = {}
+#On-disk chunked tables of repositories ingested with storage=disk, these are not in df_dict
+chunk_dict = {}
+#Where a repository's commit history can be stored
+STORAGES = ['memory', 'disk']
+#Running developer aggregates, keyed by repository
+aggregate_dict = {}
+#Clustering models of previous /group calls, keyed by (repo_name, k)
+model_dict = {}
+#Ring buffer of request profiles
+profile_store = profiling.ProfileStore()
+#Guards df_dict and the structures derived from it against concurrent ingests
+repo_lock = threading.RLock()
+#Global budget of GitHub calls per second shared by all ingests, 0 for unlimited
+github_bucket = throttle.TokenBucket(float(os.environ.get('EVNO_GITHUB_RATE', 0)))
+#(username, repo_name) of the ingests in progress
+ingesting = set()
+#Maximum number of repositories ingested at the same time across all bulk requests
+ingest_slots = threading.BoundedSemaphore(int(os.environ.get('EVNO_MAX_INGESTS', 8)))
+#Maximum number of worker threads of a single bulk request
+BULK_MAX_WORKERS = int(os.environ.get('EVNO_BULK_MAX_WORKERS', 16))
+#Process pool running sentiment inference and clustering off the request threads
+worker_pool = workers.WorkerPool()
+#Worker threads shared by cross-repository searches
+search_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('EVNO_SEARCH_WORKERS', 8)))
+#Secret shared with GitHub to sign webhook deliveries, the webhook is disabled without it
+WEBHOOK_SECRET = os.environ.get('GITHUB_WEBHOOK_SECRET')
+#Token used by the webhook to fetch the details of pushed commits
+WEBHOOK_TOKEN = os.environ.get('GITHUB_TOKEN')
 #keys that require a GET call per commit
 KEYS_FOR_COMMIT = ['filename', 'addition', 'deletion', 'changes']
 
@@ -18,6 +65,283 @@ api = Api(app)
 def home():
     return "Place holder."
 
+@app.route('/metrics')
+def metrics_endpoint():
+    '''
+    Exposes the server's stage timings, GitHub call statistics and per-repository sizes in the Prometheus text format.
+    '''
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.before_request
+def start_request_timer():
+    metrics.set_endpoint(request.endpoint)
+    request.environ['evno.start_time'] = time.perf_counter()
+
+@app.after_request
+def stop_request_timer(response):
+    start = request.environ.get('evno.start_time')
+    if start is not None:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=request.endpoint or 'none', status=response.status_code)
+    return response
+
+@app.before_request
+def start_profiler():
+    mode = profiling.requested_mode(request.headers, request.args)
+    if mode:
+        g.profiler = profiling.make_profiler(mode)
+        g.profile_mode = mode
+        g.profile_start = time.perf_counter()
+
+@app.after_request
+def stop_profiler(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.stop()
+    view_args = profiling.redact(request.view_args)
+    path = request.path
+    for key in profiling.REDACTED_KEYS:
+        if request.view_args and request.view_args.get(key):
+            path = path.replace(request.view_args[key], '***')
+    profile_store.save(profiler, {
+        'mode': g.profile_mode,
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': path,
+        'repo': view_args.get('repo_name'),
+        'params': view_args,
+        'args': profiling.redact(request.args.to_dict()),
+        'status': response.status_code,
+        'seconds': time.perf_counter() - g.profile_start,
+    })
+    return response
+
+@app.route('/profiles')
+def list_profiles():
+    '''
+    Lists the stored request profiles, newest first, with the repository and parameters of each request.
+    '''
+    return jsonify(profile_store.list())
+
+@app.route('/profiles/<name>')
+def get_profile(name):
+    '''
+    Downloads a stored profile file (.prof for cProfile, .folded for sampled stacks).
+    '''
+    path = profile_store.path(name)
+    if path is None:
+        return "Not found", 404
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+def github_get(url, headers):
+    '''
+    Performs a GET call to the GitHub API and records its status and latency.
+
+    Parameters:
+    - url (str): URL to request.
+    - headers (dict): Request headers.
+
+    Returns:
+    - requests.Response: The response object.
+
+    Note:
+    - Calls are throttled by the global `github_bucket` budget.
+    '''
+    github_bucket.acquire()
+    start = time.perf_counter()
+    try:
+        response = requests.get(url, headers=headers)
+    except requests.exceptions.RequestException:
+        metrics.observe_github_request('error', time.perf_counter() - start)
+        raise
+    metrics.observe_github_request(response.status_code, time.perf_counter() - start)
+    return response
+
+def pool_error(error):
+    '''
+    Maps a worker pool error to a response: 429 when the pool is saturated, 503 when the task timed out.
+    '''
+    status = 429 if isinstance(error, workers.PoolSaturated) else 503
+    app.logger.error(f"Worker pool error: {error}")
+    return json.dumps(f"Error: {error}"), status
+
+def add_sentiments(commits, backend=None):
+    '''
+    Runs sentiment analysis on the messages of a list of commits in one batch.
+
+    Parameters:
+    - commits (list of dict): Commits to annotate, each gets a 'sentiment' key.
+    - backend (str, optional): Name of the sentiment backend, `EVNO_SENTIMENT_BACKEND` if omitted.
+
+    Returns:
+    - str, tuple or None: An error response if the backend is unknown or cannot be loaded, or the worker pool rejected or timed out
+      the batch, None otherwise.
+
+    Note:
+    - Cheap backends (the lexicon) run on the request thread, model backends run in the worker pool.
+    '''
+    try:
+        backend = sentiment.check_backend(backend)
+    except ValueError as e:
+        return json.dumps(f"Error: {e}")
+    if len(commits) == 0:
+        return None
+    commit_msgs = [commit['msg'] for commit in commits]
+    try:
+        with metrics.stage_timer('sentiment'):
+            if sentiment.BACKENDS[backend].inline:
+                sentiments = statistics.sentiment_analysis(commit_msgs, backend)
+            else:
+                sentiments = worker_pool.sentiment(commit_msgs, backend)
+    except (workers.PoolSaturated, workers.PoolTimeout) as e:
+        return pool_error(e)
+    except (ImportError, OSError, ValueError) as e:
+        # The backend's model or libraries could not be loaded
+        app.logger.error(f"Sentiment backend '{backend}' unavailable: {e}")
+        return json.dumps(f"Error: sentiment backend '{backend}' unavailable: {e}"), 503
+    for commit, result in zip(commits, sentiments):
+        # Same shape as a single message pipeline call
+        commit['sentiment'] = [result]
+    return None
+
+def register_repo(repo_name, df):
+    '''
+    Stores a freshly ingested commit DataFrame and builds its query index, activity rollups and developer aggregates.
+
+    Parameters:
+    - repo_name (str): Name of the repository.
+    - df (pd.DataFrame): DataFrame containing the commit history.
+    '''
+    global df_dict, index_dict, chunk_dict, rollup_dict, aggregate_dict, model_dict
+    index = query.CommitIndex(df)
+    # Built at ingest so the first path search or push does not pay for them
+    index.paths()
+    index.postings('sha')
+    repo_rollups = rollups.build_rollups(df, repo_name)
+    aggregates = statistics.DeveloperAggregates()
+    aggregates.add_commits(df)
+    with repo_lock:
+        df_dict[repo_name] = df
+        index_dict[repo_name] = index
+        chunk_dict.pop(repo_name, None)
+        rollup_dict[repo_name] = repo_rollups
+        aggregate_dict[repo_name] = aggregates
+        for key in [key for key in model_dict.keys() if key[0] == repo_name]:
+            del model_dict[key]
+    metrics.record_repo_size(repo_name, df)
+    metrics.REPO_DISK_BYTES.remove(repo=repo_name)
+
+def register_chunked_repo(repo_name, table, repo_rollups, aggregates):
+    '''
+    Stores a repository ingested into an on-disk chunked table, with the rollups and aggregates built while streaming it.
+
+    Parameters:
+    - repo_name (str): Name of the repository.
+    - table (chunkstore.ChunkedTable): The repository's chunked table.
+    - repo_rollups (dict): Activity rollup tables of the repository.
+    - aggregates (statistics.DeveloperAggregates): Developer aggregates of the repository.
+    '''
+    global df_dict, index_dict, chunk_dict, rollup_dict, aggregate_dict
+    with repo_lock:
+        df_dict.pop(repo_name, None)
+        index_dict.pop(repo_name, None)
+        chunk_dict[repo_name] = table
+        rollup_dict[repo_name] = repo_rollups
+        aggregate_dict[repo_name] = aggregates
+    metrics.REPO_ROWS.set(len(table), repo=repo_name)
+    metrics.REPO_MEMORY_BYTES.remove(repo=repo_name)
+    metrics.REPO_DISK_BYTES.set(table.disk_size(), repo=repo_name)
+
+def search_repo(repo_name, commit_query):
+    '''
+    Runs a query over a repository held in memory or on disk.
+
+    Parameters:
+    - repo_name (str): Name of the repository.
+    - commit_query (query.Filter): Filter to evaluate.
+
+    Returns:
+    - pd.DataFrame or None: The matching commits, None if there is no such repository.
+    '''
+    if repo_name in index_dict.keys():
+        return query.run_query(index_dict[repo_name], commit_query)
+    if repo_name in chunk_dict.keys():
+        return chunkstore.filter_chunks(chunk_dict[repo_name], commit_query)
+    return None
+
+def append_commits(repo_name, new_df):
+    '''
+    Appends newly arrived commits to a repository already on the server.
+
+    Parameters:
+    - repo_name (str): Name of the repository.
+    - new_df (pd.DataFrame): DataFrame containing the new commits.
+
+    Returns:
+    - int: Number of commits actually appended.
+
+    Note:
+    - Falls back to `register_repo` if the repository is not loaded yet.
+    - Commits whose SHA is already stored are dropped, so overlapping deliveries are harmless.
+    - Repositories stored on disk get the new commits as an extra chunk.
+    - Rollups, developer aggregates and the query index are updated incrementally rather than rebuilt, and the
+      index of an in-memory repository is extended outside `repo_lock`.
+    '''
+    global df_dict, index_dict, chunk_dict, rollup_dict, aggregate_dict
+    while True:
+        with repo_lock:
+            if repo_name in chunk_dict.keys():
+                table = chunk_dict[repo_name]
+                known = table.shas()
+                new_df = new_df[[sha not in known for sha in new_df['sha']]] if len(new_df) else new_df
+                if len(new_df) == 0:
+                    return 0
+                table.write_chunk(new_df)
+                rollups.update_rollups(rollup_dict[repo_name], new_df, repo_name)
+                aggregate_dict[repo_name].add_commits(new_df)
+                metrics.REPO_ROWS.set(len(table), repo=repo_name)
+                metrics.REPO_DISK_BYTES.set(table.disk_size(), repo=repo_name)
+                return len(new_df)
+            if not repo_name in df_dict.keys():
+                register_repo(repo_name, new_df)
+                return len(new_df)
+            index = index_dict[repo_name]
+        if len(new_df) == 0:
+            return 0
+        # The new index is built outside the lock, from the appended rows only
+        known = index.postings('sha')
+        new_df = new_df[[sha not in known for sha in new_df['sha']]]
+        if len(new_df) == 0:
+            return 0
+        extended = index.extended(new_df)
+        with repo_lock:
+            if index_dict.get(repo_name) is not index:
+                # Another writer replaced the repository meanwhile, start over from its version
+                continue
+            df_dict[repo_name] = extended.df
+            index_dict[repo_name] = extended
+            rollups.update_rollups(rollup_dict[repo_name], new_df, repo_name)
+            aggregate_dict[repo_name].add_commits(new_df)
+        metrics.REPO_ROWS.set(len(extended.df), repo=repo_name)
+        metrics.REPO_MEMORY_BYTES.inc(int(new_df.memory_usage(deep=True).sum()), repo=repo_name)
+        return len(new_df)
+
+def stored_shas(repo_name):
+    '''
+    Returns the SHAs stored for a repository, in memory or on disk.
+
+    Parameters:
+    - repo_name (str): Name of the repository.
+
+    Returns:
+    - set or dict: The stored SHAs (for membership tests), empty if the repository is not loaded.
+    '''
+    if repo_name in index_dict.keys():
+        return index_dict[repo_name].postings('sha')
+    if repo_name in chunk_dict.keys():
+        return chunk_dict[repo_name].shas()
+    return set()
+
 @app.errorhandler(Exception)
 def handle_error(error):
     app.logger.error(f"An error occurred: {error}")
@@ -73,60 +397,128 @@ class Clone(Resource):
             sha_list.append(commit['sha'])
         return sha_list
     
-    def get_request(self, username, repo_name, token):
+    def get_request_chunks(self, username, repo_name, token, on_chunk, known_shas=None, chunk_size=chunkstore.CHUNK_SIZE, progress=None):
         '''
-        Retrieves commit information from a GitHub repository using the GitHub REST API.
+        Streams commit information from a GitHub repository using the GitHub REST API, in fixed-size chunks.
 
         Parameters:
         - username (str): GitHub username.
         - repo_name (str): Name of the repository.
         - token (str): GitHub personal access token.
+        - on_chunk (callable): Called with a pd.DataFrame of at most `chunk_size` parsed commits each time a chunk is complete.
+        - known_shas (set, optional): SHAs already on the server, their details are not fetched again.
+        - chunk_size (int, optional): Number of commits per chunk.
+        - progress (checkpoint.IngestCheckpoint, optional): Checkpoint the crawl is saved to and resumed from.
 
         Returns:
-        - pd.DataFrame: A pandas DataFrame containing commit information.
+        - str or None: Error message if a GitHub call failed, None otherwise.
 
-        Raises:
-        - subprocess.CalledProcessError: If an error occurs during the process.
-        - Exception: If the response from the GitHub API is not as expected.
-        - ValueError: If the provided token is invalid or missing.
-        - requests.exceptions.RequestException: If a network-related error occurs during the HTTP request.
+        Note:
+        - Commit listing pages are processed as they arrive, so only one page of SHAs and one chunk of parsed
+          commits are held in memory at a time.
+        - With a checkpoint, the commits saved by an interrupted crawl (except those in `known_shas`) are replayed
+          through `on_chunk` first and the crawl continues from the saved cursor. Every listing page is saved once fetched, and so are the
+          commits already fetched when a GitHub call fails.
         '''
         headers = {
                 'Authorization': f'token {token}',
                 'Accept': 'application/vnd.github.v3+json'
             }
+        url = f'https://api.github.com/repos/{username}/{repo_name}/commits?per_page=100'
+        sha_list = []
+        records = []
+        page_records = []
+        skip_shas = set(known_shas) if known_shas else set()
+
+        def emit(force=False):
+            nonlocal records
+            if len(records) >= chunk_size or (force and len(records) > 0):
+                on_chunk(pd.DataFrame(records))
+                records = []
+
+        if progress is not None:
+            state = progress.load()
+            if state is not None:
+                print(f"Resuming the ingest of '{repo_name}' from its checkpoint.")
+                sha_list, url = state['shas'], state['next']
+                for batch in progress.commits():
+                    # Commits that reached the server before the interruption are not delivered twice
+                    batch = [record for record in batch if record['sha'] not in skip_shas]
+                    skip_shas.update(record['sha'] for record in batch)
+                    records.extend(batch)
+                    emit()
+
         try:
-            print('hello')
-            response = requests.get(f'https://api.github.com/repos/{username}/{repo_name}/commits', headers=headers)
-            check = utilfunctions.check_response(response, repo_name)
-            # If an error message is returned, return it
-            if isinstance(check, str):
-               return check
-            commits = response.json()
-            # Check if there are more pages
-            while "next" in response.links.keys():
-                url = response.links["next"]["url"]
-                response = requests.get(url, headers=headers)
-                commits.extend(response.json())
-            # Extract all SHA keys from the JSON response
-            sha_list = self.get_sha_list_from_json(commits)
-            df_list = []  
-            # Iterate through each commit and retrieve detailed information
-            for sha in sha_list:
-                response = requests.get(f'https://api.github.com/repos/{username}/{repo_name}/commits/{sha}', headers=headers)
+            while True:
+                # Iterate through each commit of the page and retrieve detailed information
+                for sha in sha_list:
+                    if sha in skip_shas:
+                        continue
+                    response = github_get(f'https://api.github.com/repos/{username}/{repo_name}/commits/{sha}', headers=headers)
+                    check = utilfunctions.check_response(response, repo_name)
+                    if isinstance(check, str):
+                        return check
+                    with metrics.stage_timer('parse'):
+                        record = utilfunctions.parse_commit_record(response.json())
+                    records.append(record)
+                    page_records.append(record)
+                    emit()
+                if progress is not None:
+                    progress.save_commits(page_records)
+                page_records = []
+                if not url:
+                    break
+                response = github_get(url, headers=headers)
                 check = utilfunctions.check_response(response, repo_name)
+                # If an error message is returned, return it
                 if isinstance(check, str):
                     return check
-                else:
-                    # Parse commit information and append to the list of DataFrames
-                    df_list.append(utilfunctions.parse_commits(response.json()))
+                # Check if there are more pages
+                url = response.links["next"]["url"] if "next" in response.links.keys() else None
+                # Extract all SHA keys from the JSON response
+                sha_list = self.get_sha_list_from_json(response.json())
+                if progress is not None:
+                    progress.save_cursor(sha_list, url)
+            emit(force=True)
+            return None
 
-            # Concatenate all DataFrames in the list
-            df = pd.concat(df_list, ignore_index=True)
-            return df
-        
         except subprocess.CalledProcessError as e:
             print(f"Error getting the logs of the repository '{repo_name}': {e}")
+            return f"Error: could not get the logs of '{repo_name}'"
+        finally:
+            # Keep what was fetched of an interrupted page
+            if progress is not None and len(page_records) > 0:
+                progress.save_commits(page_records)
+
+    def get_request(self, username, repo_name, token, known_shas=None, progress=None):
+        '''
+        Retrieves commit information from a GitHub repository using the GitHub REST API.
+
+        Parameters:
+        - username (str): GitHub username.
+        - repo_name (str): Name of the repository.
+        - token (str): GitHub personal access token.
+        - known_shas (set, optional): SHAs already on the server, their details are not fetched again.
+        - progress (checkpoint.IngestCheckpoint, optional): Checkpoint the crawl is saved to and resumed from.
+
+        Returns:
+        - pd.DataFrame or str: A pandas DataFrame containing commit information (only the new commits if `known_shas` is given),
+          otherwise an error message.
+
+        Raises:
+        - ValueError: If the provided token is invalid or missing.
+        - requests.exceptions.RequestException: If a network-related error occurs during the HTTP request.
+        '''
+        df_list = []
+        check = self.get_request_chunks(username, repo_name, token, df_list.append, known_shas, progress=progress)
+        if isinstance(check, str):
+            return check
+        if len(df_list) == 0:
+            return pd.DataFrame()
+        # Concatenate all chunks
+        with metrics.stage_timer('concat'):
+            df = pd.concat(df_list, ignore_index=True)
+        return df
 
     def get(self, username, token, repo_name, dest_path):
         '''
@@ -138,45 +530,307 @@ class Clone(Resource):
         - repo_name (str): Name of the repository to clone.
         - dest_path (str): Destination path for the cloned repository.
 
+        Query arguments:
+        - mode (str, optional): Comma separated clone options among 'full', 'bare', 'blobless', 'shallow' and 'single-branch'.
+          Defaults to 'auto', a bare blobless single-branch clone, since ingest does not read file contents.
+        - since (str, optional): With 'shallow', only clone history after this date (yyyy-mm-dd).
+        - branch (str, optional): Branch to clone.
+        - storage (str, optional): 'memory' (default) or 'disk' to stream the history into on-disk chunks, for very large repositories.
+        - resume (str, optional): 'false' to discard the checkpoint of an interrupted ingest and start over.
+
         Returns:
         - str: JSON representation of the DataFrame head.
 
-        Raises:
-        - subprocess.CalledProcessError: If an error occurs during the cloning process or when obtaining logs.
+        Note:
+        - If `dest_path` already holds a clone of the repository it is updated with `git fetch` (a clone of another repository
+          is an error), and if the repository is already on the server only the commits it does not have yet are fetched
+          from the GitHub API.
+        - An ingest interrupted by a failed GitHub call or a server restart resumes from its checkpoint when retried.
         '''
-        global df_dict
+        try:
+            options = utilfunctions.parse_clone_mode(request.args.get('mode'))
+        except ValueError as e:
+            return json.dumps(f"Error: {e}")
+        since = request.args.get('since')
+        branch = request.args.get('branch')
+        storage = request.args.get('storage', 'memory')
+        if storage not in STORAGES:
+            return json.dumps(f"Error: Invalid storage '{storage}', expected one of {STORAGES}")
+        resume = request.args.get('resume', 'true').lower() != 'false'
 
+        ret = self.ingest(username, token, repo_name, dest_path, options, since, branch, storage, resume)
+        if isinstance(ret, str):
+            return json.dumps(ret)
+        return ret.head().to_json()
 
+    def ingest(self, username, token, repo_name, dest_path, options, since=None, branch=None, storage='memory', resume=True):
+        '''
+        Clones (or fetches) a repository and loads its commit history on the server.
+
+        Parameters:
+        - username (str): GitHub username or organization owning the repository.
+        - token (str): GitHub personal access token.
+        - repo_name (str): Name of the repository to clone.
+        - dest_path (str): Destination path for the cloned repository.
+        - options (list): Clone options as returned by `utilfunctions.parse_clone_mode`.
+        - since (str, optional): With 'shallow', only clone history after this date (yyyy-mm-dd).
+        - branch (str, optional): Branch to clone.
+        - storage (str, optional): 'memory' or 'disk'.
+        - resume (bool, optional): Resume from the checkpoint of an interrupted ingest, if any, rather than starting over.
+
+        Returns:
+        - pd.DataFrame, chunkstore.ChunkedTable or str: The repository's commit table if successful, otherwise an error message.
+
+        Note:
+        - Progress is checkpointed under `EVNO_CHECKPOINT_DIR` and the checkpoint is removed once the ingest succeeded.
+        - Only one ingest of a given repository runs at a time, since they would share the checkpoint.
+        - The names are checked against GitHub's naming rules first, since they become paths on the server, and the branch
+          against git's, since it is passed to git.
+        '''
+        for name in (username, repo_name):
+            if not utilfunctions.validate_github_name(name):
+                return f"Error: Invalid GitHub name '{name}'"
+        if branch and not utilfunctions.validate_branch_name(branch):
+            return f"Error: Invalid branch name '{branch}'"
+        with repo_lock:
+            if (username, repo_name) in ingesting:
+                return f"Error: '{username}/{repo_name}' is already being ingested"
+            ingesting.add((username, repo_name))
+        try:
+            return self.ingest_checkpointed(username, token, repo_name, dest_path, options, since, branch, storage, resume)
+        finally:
+            with repo_lock:
+                ingesting.discard((username, repo_name))
+
+    def ingest_checkpointed(self, username, token, repo_name, dest_path, options, since, branch, storage, resume):
+        '''
+        Body of `ingest`, run while holding the repository's ingest slot.
+        '''
+        try:
+            progress = checkpoint.for_repo(username, repo_name)
+        except ValueError as e:
+            return f"Error: {e}"
+        if not resume:
+            progress.clear()
         repo_url = f'https://github.com/{username}/{repo_name}.git'
-        # Defining the clone command
-        clone_cmd = ['git', 'clone', repo_url, dest_path]
         try:
-            # Cloning the repository
-            subprocess.run(clone_cmd, check=True)
-            print(f"Repository '{repo_name}' cloned successfully.")
+            if utilfunctions.is_git_repo(dest_path):
+                origin = utilfunctions.get_origin_url(dest_path)
+                if origin is None or not utilfunctions.same_repo_url(origin, repo_url):
+                    return f"Error: '{dest_path}' already holds a clone of {origin or 'another repository'}, not of '{username}/{repo_name}'"
+                # Updating the existing clone
+                with metrics.stage_timer('git_fetch'):
+                    subprocess.run(utilfunctions.build_fetch_cmd(dest_path, options, since, branch), check=True)
+                print(f"Repository '{repo_name}' fetched successfully.")
+            else:
+                # Cloning the repository
+                with metrics.stage_timer('git_clone'):
+                    subprocess.run(utilfunctions.build_clone_cmd(repo_url, dest_path, options, since, branch), check=True)
+                print(f"Repository '{repo_name}' cloned successfully.")
+        except subprocess.CalledProcessError as e:
+            print(f"Error cloning repository '{repo_name}': {e}")
+            return f"Error: git exited with code {e.returncode} for '{repo_name}'"
+
+        if storage == 'disk':
+            table = self.ingest_chunked(username, token, repo_name, progress)
+            if not isinstance(table, str):
+                progress.clear()
+            return table
+
+        known_shas = set(df_dict[repo_name]['sha']) if repo_name in df_dict.keys() else None
+        df = self.get_request(username, repo_name, token, known_shas, progress)
+        if not isinstance(df, pd.DataFrame):
+            return df if df is not None else f"Error: could not get the logs of '{repo_name}'"
+        if known_shas is None:
+            register_repo(repo_name, df)
+        else:
+            print(f"Fetched {len(df)} new commits for '{repo_name}'.")
+            append_commits(repo_name, df)
+        progress.clear()
+        return df_dict[repo_name]
+
+    def ingest_chunked(self, username, token, repo_name, progress=None):
+        '''
+        Streams a repository's commit history into an on-disk chunked table within a fixed memory ceiling.
+
+        Parameters:
+        - username (str): GitHub username or organization owning the repository.
+        - token (str): GitHub personal access token.
+        - repo_name (str): Name of the repository.
+        - progress (checkpoint.IngestCheckpoint, optional): Checkpoint the crawl is saved to and resumed from.
+
+        Returns:
+        - chunkstore.ChunkedTable or str: The repository's table if successful, otherwise an error message.
+
+        Note:
+        - Each chunk is written to disk, folded into the activity rollups and developer aggregates, then released.
+        - If the repository is already stored on disk only the missing commits are fetched and appended.
+        '''
+        existing = repo_name in chunk_dict.keys()
+        # Reuse the live table so its cached SHAs see the commits appended by webhooks meanwhile
+        try:
+            table = chunk_dict[repo_name] if existing else chunkstore.ChunkedTable(os.path.join(chunkstore.STORE_DIR, repo_name))
+        except ValueError as e:
+            return f"Error: {e}"
+        if existing:
+            with repo_lock:
+                known_shas = set(table.shas())
+            repo_rollups = rollup_dict[repo_name]
+            aggregates = aggregate_dict[repo_name]
+        else:
+            table.clear()
+            known_shas = None
+            repo_rollups = None
+            aggregates = statistics.DeveloperAggregates()
+
+        def on_chunk(chunk):
+            nonlocal repo_rollups
+            with repo_lock:
+                with metrics.stage_timer('write_chunk'):
+                    table.write_chunk(chunk)
+                if repo_rollups is None:
+                    repo_rollups = rollups.build_rollups(chunk, repo_name)
+                else:
+                    rollups.update_rollups(repo_rollups, chunk, repo_name)
+                aggregates.add_commits(chunk)
+
+        check = self.get_request_chunks(username, repo_name, token, on_chunk, known_shas, progress=progress)
+        if isinstance(check, str):
+            return check
+        if repo_rollups is None:
+            return f"Error: no commits found for '{repo_name}'"
+        register_chunked_repo(repo_name, table, repo_rollups, aggregates)
+        return table
+
+
+class BulkClone(Resource):
+    '''
+    Resource that ingests many repositories, or a whole organization, concurrently.
+    '''
+    def list_owner_repos(self, owner, token):
+        '''
+        Enumerates the repositories of an organization or user through the GitHub API.
+
+        Parameters:
+        - owner (str): Organization or user name.
+        - token (str): GitHub personal access token.
+
+        Returns:
+        - list or str: A list of repository names if successful, otherwise an error message.
+        '''
+        headers = {
+                'Authorization': f'token {token}',
+                'Accept': 'application/vnd.github.v3+json'
+            }
+        response = github_get(f'https://api.github.com/orgs/{owner}/repos?per_page=100', headers=headers)
+        if response.status_code == 404:
+            # Not an organization, try a user account
+            response = github_get(f'https://api.github.com/users/{owner}/repos?per_page=100', headers=headers)
+        check = utilfunctions.check_response(response, owner)
+        if isinstance(check, str):
+            return check
+        repos = response.json()
+        # Check if there are more pages
+        while "next" in response.links.keys():
+            response = github_get(response.links["next"]["url"], headers=headers)
+            check = utilfunctions.check_response(response, owner)
+            if isinstance(check, str):
+                return check
+            repos.extend(response.json())
+        return [repo['name'] for repo in repos]
+
+    def ingest_one(self, owner, token, repo_name, dest_dir, options, since, branch):
+        '''
+        Ingests a single repository under the global ingest budget and reports the outcome.
+
+        Returns:
+        - dict: {'status': 'ok', 'commits': n} or {'status': 'error', 'error': message}.
+        '''
+        metrics.set_endpoint('bulkclone')
+        with ingest_slots:
             try:
-                df = self.get_request(username, repo_name, token)
-                if not isinstance(df, pd.DataFrame):
-                    return json.dumps(df)
-                df_dict[repo_name] = df
-                return df.head().to_json()
-            except subprocess.CalledProcessError as e:
-                print(f"Error getting the logs of the repository '{repo_name}': {e}")
+                df = Clone().ingest(owner, token, repo_name, os.path.join(dest_dir, owner, repo_name), options, since, branch)
+            except Exception as e:
+                app.logger.error(f"Error ingesting '{owner}/{repo_name}': {e}")
+                return {'status': 'error', 'error': f"Error: {e}"}
+        if not isinstance(df, pd.DataFrame):
+            return {'status': 'error', 'error': df}
+        return {'status': 'ok', 'commits': len(df)}
 
-        except subprocess.CalledProcessError as e:
-            # Check if the error is due to the repository already existing
-            if e.returncode == 128:
-                print(f"Repository '{repo_name}' already exists. Proceeding.")
-                try:
-                    df = self.get_request(username, repo_name, token)
-                    if not isinstance(df, pd.DataFrame):
-                        return 'null'
-                    df_dict[repo_name] = df
-                    return df.head().to_json()
-                except subprocess.CalledProcessError as e:
-                    print(f"Error getting the logs of the repository '{repo_name}': {e}")
-            else:
-                print(f"Error cloning repository '{repo_name}': {e}")
+    def post(self):
+        '''
+        Handles a POST request ingesting a list of repositories or every repository of an owner.
+
+        Request body:
+        - token (str): GitHub personal access token.
+        - owner (str): Organization or user owning the repositories.
+        - repos (list, optional): Repository names (or 'owner/name'), every repository of `owner` if omitted.
+        - dest_dir (str, optional): Base directory of the clones, repositories go to `<dest_dir>/<owner>/<name>`.
+        - mode, since, branch (str, optional): Clone options, see `Clone.get`.
+        - concurrency (int, optional): Number of repositories ingested in parallel, capped by `BULK_MAX_WORKERS`.
+
+        Returns:
+        - str: JSON object with per-repository results and the number of successes and failures.
+
+        Note:
+        - All GitHub calls share the `EVNO_GITHUB_RATE` budget and at most `EVNO_MAX_INGESTS` repositories are
+          ingested at the same time across all bulk requests.
+        '''
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            return json.dumps("Error: the request body must be a JSON object")
+        for key in ['token', 'owner', 'dest_dir', 'mode', 'since', 'branch']:
+            if body.get(key) is not None and not isinstance(body[key], str):
+                return json.dumps(f"Error: '{key}' must be a string")
+        repos = body.get('repos')
+        if repos is not None and not (isinstance(repos, list) and all(isinstance(repo, str) for repo in repos)):
+            return json.dumps("Error: 'repos' must be a list of repository names")
+        concurrency = body.get('concurrency')
+        if concurrency is None:
+            concurrency = BULK_MAX_WORKERS
+        try:
+            if isinstance(concurrency, (bool, float)):
+                raise ValueError
+            concurrency = min(max(int(concurrency), 1), BULK_MAX_WORKERS)
+        except (TypeError, ValueError):
+            return json.dumps("Error: 'concurrency' must be an integer")
+        token = body.get('token')
+        owner = body.get('owner')
+        if not token or not (owner or repos):
+            return json.dumps("Error: 'token' and either 'owner' or 'repos' are required")
+        if owner and not utilfunctions.validate_github_name(owner):
+            return json.dumps(f"Error: Invalid GitHub name '{owner}'")
+        try:
+            options = utilfunctions.parse_clone_mode(body.get('mode'))
+        except ValueError as e:
+            return json.dumps(f"Error: {e}")
+
+        start = time.perf_counter()
+        if not repos:
+            repos = self.list_owner_repos(owner, token)
+            if isinstance(repos, str):
+                return json.dumps(repos)
+        targets = []
+        for repo in repos:
+            repo_owner, _, repo_name = repo.rpartition('/')
+            targets.append((repo_owner or owner, repo_name))
+        if any(repo_owner is None for repo_owner, _ in targets):
+            return json.dumps("Error: repositories without an owner require 'owner'")
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(self.ingest_one, repo_owner, token, repo_name, body.get('dest_dir') or 'output',
+                                       options, body.get('since'), body.get('branch')): f'{repo_owner}/{repo_name}'
+                       for repo_owner, repo_name in targets}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        succeeded = sum(1 for result in results.values() if result['status'] == 'ok')
+        return json.dumps({
+            'repos': results,
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'seconds': time.perf_counter() - start,
+        })
 
 
 class Search(Resource):
@@ -197,19 +851,25 @@ class Search(Resource):
         - committer (str, optional): Committer's name to filter by.
         - analyze (bool, optional): If True, performs sentiment analysis on commit messages.
 
+        Query parameters:
+        - path (str, optional): Only commits touching this file.
+        - path_prefix (str, optional): Only commits touching a file inside this directory (e.g. 'src/core/').
+        - path_glob (str, optional): Only commits touching a file matching this shell-style pattern (e.g. 'src/*.py').
+        - sentiment (str, optional): Sentiment backend used with `analyze`, see `utils.sentiment.BACKENDS`.
+
         Returns:
         - str: JSON representation of the search results.
 
         Note:
         - If the specified repository does not exist in the server's commit data, 'null' is returned.
+        - Path filters are served from the repository's path index, see `utils.query.PathIndex`.
         - Sentiment analysis is applied to commit messages if the `analyze` parameter is set to True.
         '''
-        global df_dict
+        global df_dict, chunk_dict
 
-        if not repo_name in df_dict.keys():
+        if not (repo_name in df_dict.keys() or repo_name in chunk_dict.keys()):
             print("No such repository")
             return 'null'
-        df = df_dict[repo_name]
 
         # Convert 'None' strings to actual None values
         sha = None if sha == 'None' else sha
@@ -217,13 +877,27 @@ class Search(Resource):
         date_range = None if start_date == 'None' and end_date == 'None' else (start_date, end_date)
         msg = None if msg == 'None' else msg
         commiter = None if commiter == 'None' else commiter
+        path = request.args.get('path')
+        path_prefix = request.args.get('path_prefix')
+        path_glob = request.args.get('path_glob')
 
         # Perform commit search using utility function
-        response = utilfunctions.search_commit(df, sha, author, date_range, msg, commiter)
+        try:
+            with metrics.stage_timer('query'):
+                if repo_name in df_dict.keys():
+                    response = utilfunctions.search_commit(df_dict[repo_name], sha, author, date_range, msg, commiter, index_dict.get(repo_name),
+                                                           path, path_prefix, path_glob)
+                else:
+                    # Repositories stored on disk are searched chunk by chunk
+                    commit_query = utilfunctions.build_commit_query(sha, author, date_range, msg, commiter, path, path_prefix, path_glob)
+                    response = search_repo(repo_name, commit_query).to_dict(orient='records')
+        except ValueError as e:
+            return json.dumps(f"Error: {e}")
         # Optionally, perform sentiment analysis on commit messages
         if analyze == 'True':
-            for commit in response:
-                commit['sentiment'] = statistics.sentiment_analysis(commit['msg'])
+            error = add_sentiments(response, request.args.get('sentiment'))
+            if error is not None:
+                return error
         # If no matching commits are found, return 'null'
         if len(response) == 0:
             return 'null'
@@ -232,39 +906,374 @@ class Search(Resource):
         return json.dumps(response)
 
 
+class SearchAll(Resource):
+    '''
+    Resource that searches the commit history of many (or all) repositories on the server in parallel.
+    '''
+    def search_shard(self, repo_name, index, commit_query, limit, descending):
+        '''
+        Runs a query over a single repository and returns its matches ordered by date.
+
+        Parameters:
+        - repo_name (str): Name of the repository.
+        - index (query.CommitIndex or chunkstore.ChunkedTable): Index over the repository's commit DataFrame,
+          or its on-disk table.
+        - commit_query (query.Filter): Filter to evaluate.
+        - limit (int or None): Maximum number of commits to return.
+        - descending (bool): Newest commits first if True.
+
+        Returns:
+        - list of tuple: (timestamp, commit dict) pairs, each commit dict tagged with its 'repo'.
+        '''
+        metrics.set_endpoint('searchall')
+        with metrics.stage_timer('query'):
+            if isinstance(index, chunkstore.ChunkedTable):
+                # Filter chunk by chunk, then order the matches only
+                matches = chunkstore.filter_chunks(index, commit_query)
+                if len(matches) == 0:
+                    return []
+                index = query.CommitIndex(matches)
+                commit_query = query.All()
+            positions = commit_query.mask(index).nonzero()[0]
+            dates = index.timestamps()[positions]
+            order = dates.argsort(kind='stable')
+            if descending:
+                order = order[::-1]
+            if limit is not None:
+                order = order[:limit]
+            records = index.df.iloc[positions[order]].to_dict(orient='records')
+        for record in records:
+            record['repo'] = repo_name
+        return list(zip(dates[order].tolist(), records))
+
+    def post(self):
+        '''
+        Handles a POST request searching many repositories at once.
+
+        Request body:
+        - repos (list, optional): Repositories to search, every repository on the server if omitted.
+        - filter (dict, optional): Filter specification, see `utils.query.parse_filter`.
+        - sha, author, start_date, end_date, msg, commiter, path, path_prefix, path_glob (str, optional): Classic search keys,
+          used when no `filter` is given.
+        - order (str, optional): 'desc' (default) for newest commits first, 'asc' for oldest first.
+        - limit (int, optional): Maximum number of commits returned.
+        - stream (bool, optional): If True, results are streamed as newline delimited JSON, one line per repository
+          as soon as its search completes, followed by a summary line. Commits are ordered within each repository only.
+
+        Returns:
+        - str or Response: JSON list of the matching commits ordered by date across all repositories (each tagged with its 'repo'),
+          or the NDJSON stream.
+        '''
+        body = request.get_json(silent=True) or {}
+        try:
+            if body.get('filter'):
+                commit_query = query.parse_filter(body['filter'])
+            else:
+                date = (body.get('start_date'), body.get('end_date')) if body.get('start_date') or body.get('end_date') else None
+                commit_query = utilfunctions.build_commit_query(body.get('sha'), body.get('author'), date, body.get('msg'), body.get('commiter'),
+                                                                body.get('path'), body.get('path_prefix'), body.get('path_glob'))
+            limit = int(body['limit']) if body.get('limit') is not None else None
+        except ValueError as e:
+            return json.dumps(f"Error: {e}")
+        descending = body.get('order', 'desc') != 'asc'
+
+        with repo_lock:
+            tables = dict(index_dict, **chunk_dict)
+            repo_names = body.get('repos') or list(tables.keys())
+            shards = {repo_name: tables[repo_name] for repo_name in repo_names if repo_name in tables}
+        missing = [repo_name for repo_name in repo_names if repo_name not in shards]
+        futures = {search_executor.submit(self.search_shard, repo_name, index, commit_query, limit, descending): repo_name
+                   for repo_name, index in shards.items()}
+
+        if body.get('stream'):
+            def generate():
+                failed = {}
+                for future in as_completed(futures):
+                    try:
+                        commits = [record for _, record in future.result()]
+                    except Exception as e:
+                        failed[futures[future]] = f"Error: {e}"
+                        continue
+                    yield json.dumps({'repo': futures[future], 'commits': commits}, default=str) + '\n'
+                yield json.dumps({'done': True, 'missing': missing, 'failed': failed}) + '\n'
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        results = []
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                app.logger.error(f"Error searching '{futures[future]}': {e}")
+        merged = heapq.merge(*results, key=lambda pair: pair[0], reverse=descending)
+        response = [record for _, record in itertools.islice(merged, limit)]
+        if len(response) == 0:
+            return 'null'
+        return json.dumps(response, default=str)
+
+
+class Query(Resource):
+    '''
+    Resource that runs a composed filter over an existing commit history on the server.
+    '''
+    def post(self, repo_name):
+        '''
+        Handles a POST request with a JSON filter specification.
+
+        Parameters:
+        - repo_name (str): Name of the repository to search.
+
+        Request body:
+        - filter (dict): Filter specification, see `utils.query.parse_filter`.
+        - analyze (bool, optional): If True, performs sentiment analysis on commit messages.
+        - sentiment (str, optional): Sentiment backend used with `analyze`, see `utils.sentiment.BACKENDS`.
+
+        Returns:
+        - str: JSON representation of the search results.
+
+        Example:
+        ```
+        {"filter": {"or": [{"field": "author", "op": "in", "value": ["alice", "bob"]},
+                           {"field": "msg", "op": "regex", "value": "^fix", "ignore_case": true}]}}
+        ```
+        '''
+        global df_dict, chunk_dict
+
+        if not (repo_name in df_dict.keys() or repo_name in chunk_dict.keys()):
+            print("No such repository")
+            return 'null'
+        body = request.get_json(silent=True) or {}
+        try:
+            with metrics.stage_timer('query'):
+                commit_query = query.parse_filter(body.get('filter'))
+                response = search_repo(repo_name, commit_query).to_dict(orient='records')
+        except ValueError as e:
+            return json.dumps(f"Error: {e}")
+        if body.get('analyze'):
+            error = add_sentiments(response, body.get('sentiment'))
+            if error is not None:
+                return error
+        if len(response) == 0:
+            return 'null'
+        return json.dumps(response)
+
+
+class Activity(Resource):
+    '''
+    Resource that serves commit activity time series from the precomputed rollups.
+    '''
+    def get(self, repo_name, by, granularity, name=None, start_date=None, end_date=None):
+        '''
+        Handles a GET request for an activity time series.
+
+        Parameters:
+        - repo_name (str): Name of the repository.
+        - by (str): Dimension to group by: 'author', 'committer' or 'repo'.
+        - granularity (str): Bucket size: 'day', 'week' or 'month'.
+        - name (str, optional): Only return the series of this author/committer.
+        - start_date (str, optional): Start date for filtering buckets (yyyy-mm-dd).
+        - end_date (str, optional): End date for filtering buckets (yyyy-mm-dd).
+
+        Returns:
+        - str: JSON list of {name, bucket, commits, added, deleted, changed} records.
+        '''
+        global rollup_dict
+
+        if not repo_name in rollup_dict.keys():
+            print("No such repository")
+            return 'null'
+        name = None if name == 'None' else name
+        start_date = None if start_date == 'None' else start_date
+        end_date = None if end_date == 'None' else end_date
+        try:
+            response = rollups.query_rollups(rollup_dict[repo_name], granularity, by, name, start_date, end_date)
+        except ValueError as e:
+            return json.dumps(f"Error: {e}")
+        if len(response) == 0:
+            return 'null'
+        return json.dumps(response)
+
+
+class Churn(Resource):
+    '''
+    Resource that serves the most frequently changed files of a repository from its path index.
+    '''
+    def get(self, repo_name):
+        '''
+        Handles a GET request for the top churned files.
+
+        Parameters:
+        - repo_name (str): Name of the repository.
+
+        Query parameters:
+        - start_date, end_date (str, optional): Only count commits in this date range (yyyy-mm-dd).
+        - path_prefix (str, optional): Only count files inside this directory.
+        - path_glob (str, optional): Only count files matching this shell-style pattern.
+        - limit (int, optional): Number of files returned, 20 by default.
+
+        Returns:
+        - str: JSON list of {path, commits} records, most changed first.
+        '''
+        global index_dict, chunk_dict
+
+        if not (repo_name in index_dict.keys() or repo_name in chunk_dict.keys()):
+            print("No such repository")
+            return 'null'
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        try:
+            limit = int(request.args.get('limit', 20))
+            commit_query = query.DateRange(start_date, end_date) if start_date or end_date else None
+            with metrics.stage_timer('churn'):
+                if repo_name in index_dict.keys():
+                    churn = query.path_churn(index_dict[repo_name], commit_query, request.args.get('path_prefix'), request.args.get('path_glob'))
+                else:
+                    # Repositories stored on disk are counted chunk by chunk
+                    counts = [query.path_churn(query.CommitIndex(chunk), commit_query, request.args.get('path_prefix'), request.args.get('path_glob'))
+                              for chunk in chunk_dict[repo_name].iter_chunks(columns=['date', 'files'])]
+                    churn = pd.concat(counts).groupby(level=0).sum() if counts else pd.Series(dtype='int64')
+        except ValueError as e:
+            return json.dumps(f"Error: {e}")
+        top = heapq.nlargest(limit, churn.items(), key=lambda pair: pair[1])
+        if len(top) == 0:
+            return 'null'
+        return json.dumps([{'path': path, 'commits': int(commits)} for path, commits in top])
+
+
+class Webhook(Resource):
+    '''
+    Resource receiving GitHub webhook deliveries, so new commits and issues land without re-crawling.
+    '''
+    def fetch_commits(self, owner, repo_name, payload_commits):
+        '''
+        Builds the commit records of pushed commits, fetching their details from the GitHub API when possible.
+
+        Parameters:
+        - owner (str): Owner of the repository.
+        - repo_name (str): Name of the repository.
+        - payload_commits (list): Commits of the push payload not stored on the server yet.
+
+        Returns:
+        - tuple: (list of commit records, number of commits fetched from the API).
+
+        Note:
+        - If no `GITHUB_TOKEN` is configured or a fetch fails, the record is built from the payload itself.
+        '''
+        headers = {
+                'Authorization': f'token {WEBHOOK_TOKEN}',
+                'Accept': 'application/vnd.github.v3+json'
+            }
+        records = []
+        fetched = 0
+        for commit in payload_commits:
+            if WEBHOOK_TOKEN:
+                try:
+                    response = github_get(f'https://api.github.com/repos/{owner}/{repo_name}/commits/{commit["id"]}', headers=headers)
+                    if utilfunctions.check_response(response, repo_name) is None:
+                        with metrics.stage_timer('parse'):
+                            records.append(utilfunctions.parse_commit_record(response.json()))
+                        fetched += 1
+                        continue
+                except requests.exceptions.RequestException as e:
+                    app.logger.error(f"Error fetching commit '{commit['id']}' of '{repo_name}': {e}")
+            records.append(utilfunctions.parse_push_commit(commit))
+        return records, fetched
+
+    def post(self):
+        '''
+        Handles a GitHub webhook delivery.
+
+        Headers:
+        - X-GitHub-Event (str): 'push', 'issues', 'pull_request' or 'ping'.
+        - X-Hub-Signature-256 (str): HMAC-SHA256 signature of the body with `GITHUB_WEBHOOK_SECRET`.
+
+        Returns:
+        - str: JSON summary of what was updated.
+
+        Note:
+        - push: commits pushed to the default branch whose SHA is not stored yet are appended to the repository's commit table,
+          pushes to other branches are ignored.
+        - issues / pull_request: the issue (pull requests are issues to the GitHub API) is upserted into the
+          repository's developer aggregates used by /group, deleted and transferred issues are removed from them.
+        - Deliveries for repositories that are not on the server are acknowledged and ignored.
+        '''
+        if not WEBHOOK_SECRET:
+            return json.dumps("Error: webhook secret is not configured"), 403
+        if not utilfunctions.verify_signature(WEBHOOK_SECRET, request.get_data(), request.headers.get('X-Hub-Signature-256')):
+            return json.dumps("Error: invalid signature"), 401
+        event = request.headers.get('X-GitHub-Event')
+        payload = request.get_json(silent=True) or {}
+        if event == 'ping':
+            return json.dumps({'event': event})
+        if not 'repository' in payload.keys():
+            return json.dumps("Error: payload has no repository"), 400
+        repo_name = payload['repository']['name']
+        owner = payload['repository']['owner'].get('login') or payload['repository']['owner'].get('name')
+        if not (repo_name in df_dict.keys() or repo_name in chunk_dict.keys()):
+            return json.dumps({'event': event, 'repo': repo_name, 'ignored': True})
+
+        if event == 'push':
+            # /clone lists the default branch only, pushes to other branches and branch deletions would make the two disagree
+            if payload.get('deleted') or payload.get('ref') != f"refs/heads/{payload['repository'].get('default_branch')}":
+                return json.dumps({'event': event, 'repo': repo_name, 'ref': payload.get('ref'), 'ignored': True})
+            known = stored_shas(repo_name)
+            new_commits = [commit for commit in payload.get('commits', []) if commit['id'] not in known]
+            records, fetched = self.fetch_commits(owner, repo_name, new_commits)
+            appended = append_commits(repo_name, pd.DataFrame(records)) if records else 0
+            return json.dumps({'event': event, 'repo': repo_name, 'appended': appended, 'fetched': fetched})
+
+        if event in ('issues', 'pull_request'):
+            issue = payload['issue'] if event == 'issues' else payload['pull_request']
+            # A deleted or transferred issue no longer belongs to the repository
+            removed = event == 'issues' and payload.get('action') in ('deleted', 'transferred')
+            with repo_lock:
+                if removed:
+                    aggregate_dict[repo_name].remove_issues([issue['number']])
+                else:
+                    aggregate_dict[repo_name].upsert_issues([issue])
+            return json.dumps({'event': event, 'repo': repo_name, 'issue': issue['number'], 'removed': removed})
+
+        return json.dumps({'event': event, 'repo': repo_name, 'ignored': True})
+
+
 class Group(Resource):
     '''
     Resource that groups developers based on their commit history and issues history.
     '''
-    def get_issues(self, username, repo_name, token):
+    def get_issues(self, username, repo_name, token, since=None):
         '''
-        Calls the GitHub API to retrieve issues for a specified repository and parses the response into a pandas DataFrame.
+        Calls the GitHub API to retrieve issues for a specified repository.
 
         Parameters:
         - username (str): GitHub username.
         - repo_name (str): Name of the repository.
         - token (str): GitHub personal access token.
+        - since (str, optional): Only retrieve issues updated at or after this ISO 8601 timestamp.
 
         Returns:
-        - pd.DataFrame or str: A pandas DataFrame containing issues data if successful, otherwise an error message.
+        - list or str: A list of issues (open and closed) if successful, otherwise an error message.
         '''
         headers = {
                 'Authorization': f'token {token}',
                 'Accept': 'application/vnd.github.v3+json'
             }
+        url = f'https://api.github.com/repos/{username}/{repo_name}/issues?state=all&per_page=100'
+        if since:
+            url += f'&since={since}'
         try:
-            response = requests.get(f'https://api.github.com/repos/{username}/{repo_name}/issues', headers=headers)
+            response = github_get(url, headers=headers)
             check = utilfunctions.check_response(response, repo_name)
+            # If an error message is returned, return it
+            if isinstance(check, str):
+                return check
             issues = response.json()
             # Check if there are more pages
             while "next" in response.links.keys():
                 url = response.links["next"]["url"]
-                response = requests.get(url, headers=headers)
+                response = github_get(url, headers=headers)
                 check = utilfunctions.check_response(response, repo_name)
+                if isinstance(check, str):
+                    return check
                 issues.extend(response.json())
-            # If an error message is returned, return it
-            if isinstance(check, str):
-                return check
             return issues
         except subprocess.CalledProcessError as e:
             print(f"Error getting the logs of the repository '{repo_name}': {e}")
@@ -284,32 +1293,41 @@ class Group(Resource):
 
         Note:
         - If the specified repository does not exist in the server's commit data, 'null' is returned.
-        - If there is an issue retrieving the GitHub issues, 'null' is returned.
-        - The k-means clustering is performed on the combined features of commit history and issues history.
+        - If there is an issue retrieving the GitHub issues, the clustering uses the issues already known to the server.
+        - Clustering reads the repository's running developer aggregates, only issues updated since the previous
+          call are fetched, and the model of the previous call with the same k is warm-started.
         '''
-        global df_dict
+        global aggregate_dict, model_dict
 
-        if not repo_name in df_dict.keys():
+        if not repo_name in aggregate_dict.keys():
             return 'null'
-        # Retrieve the commit data DataFrame for the specified repository
-        df = df_dict[repo_name]
-        # Retrieve issues data from the GitHub API
-        response = self.get_issues(username, repo_name, token)
-        # If there is an issue retrieving the GitHub issues, go with commit history only
-        if isinstance(response, str):
-            ret = statistics.kmeans(df, k)
-            if ret is None:
-                return 'null'
-            return ret.to_json()
-        
-        # Perform k-means clustering using issues data as well
-        ret = statistics.kmeans(df, k, response)
+        aggregates = aggregate_dict[repo_name]
+        # Retrieve issues updated since the last call from the GitHub API
+        response = self.get_issues(username, repo_name, token, aggregates.issues_updated_at)
+        if isinstance(response, list):
+            with repo_lock:
+                aggregates.upsert_issues(response)
+        try:
+            ret, model = statistics.kmeans_from_aggregates(aggregates, k, model_dict.get((repo_name, k)), worker_pool.cluster)
+        except (workers.PoolSaturated, workers.PoolTimeout) as e:
+            return pool_error(e)
         if ret is None:
             return 'null'
+        model_dict[(repo_name, k)] = model
         return ret.to_json()
     
 api.add_resource(Clone, '/clone/<username>/<token>/<repo_name>/<dest_path>/')
+api.add_resource(BulkClone, '/bulk_clone')
 api.add_resource(Search, '/search/<repo_name>/<sha>/<author>/<start_date>/<end_date>/<msg>/<commiter>/<analyze>')
+api.add_resource(SearchAll, '/search_all')
+api.add_resource(Query, '/query/<repo_name>')
+api.add_resource(Activity, '/activity/<repo_name>/<by>/<granularity>/<name>/<start_date>/<end_date>')
+api.add_resource(Churn, '/churn/<repo_name>')
+api.add_resource(Webhook, '/webhook')
 api.add_resource(Group, '/group/<username>/<token>/<repo_name>/<k>')
 if __name__ == "__main__":
-    app.run(debug=True)
+    debug = True
+    # The debug reloader also runs this block in its watching parent process, which never serves requests
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        worker_pool.start()
+    app.run(debug=debug)
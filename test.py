@@ -1,6 +1,9 @@
+import argparse
+import json
 import requests
 from requests.exceptions import HTTPError, RequestException
 import utils.utilfunctions as utilfunctions
+import utils.loadgen as loadgen
 
 
 BASE = 'http://127.0.0.1:5000'
@@ -31,7 +34,7 @@ def clone(username, token):
     
     try:
         # Send a GET request to the server's /clone endpoint
-        clone_response = requests.get(f'{BASE}/clone/{username}/{token}/{repo_name}/output')
+        clone_response = requests.get(f'{BASE}/clone/{username}/{token}/{repo_name}/output-{username}-{repo_name}')
         clone_response.raise_for_status()  # This will raise an HTTPError for bad responses
     except HTTPError as errh:
         print(f"HTTP Error: {errh}")
@@ -199,7 +202,49 @@ def info():
     print("You can quit the program at any time by pressing q, and you can quit a search by pressing qs (quit search).")
     print("Enjoy!")
 
+def load(args):
+    '''
+    Replays a scripted workload against the server and prints a per-endpoint report.
+
+    Parameters:
+    - args (argparse.Namespace): Parsed command line arguments.
+
+    Note:
+    - With --in-process the server's Flask app is imported and driven through its test client, no server needs to run.
+    '''
+    workload = loadgen.load_workload(args.workload)
+    if args.in_process:
+        from app import app
+        sender = loadgen.InProcessSender(app)
+    else:
+        sender = loadgen.LiveSender(args.base)
+    print(f"Running {args.workload} with {args.workers} workers at {args.rate} req/s for {args.duration}s...")
+    samples, elapsed = loadgen.run_load(sender, workload, args.workers, args.rate, args.duration, args.requests, args.seed)
+    rows = loadgen.summarize(samples, elapsed)
+    if args.json:
+        print(json.dumps(rows))
+    else:
+        loadgen.print_report(rows)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Interactive client, or scripted load generator with --workload.")
+    parser.add_argument('--workload', help="JSON lines workload file, runs the load generator instead of the interactive client")
+    parser.add_argument('--workers', type=int, default=4, help="number of concurrent workers")
+    parser.add_argument('--rate', type=float, default=10, help="target requests per second across all workers, 0 for unthrottled")
+    parser.add_argument('--duration', type=float, default=10, help="seconds to run for")
+    parser.add_argument('--requests', type=int, default=None, help="stop after this many requests")
+    parser.add_argument('--seed', type=int, default=None, help="seed of the operation picker")
+    parser.add_argument('--base', default=BASE, help="server URL")
+    parser.add_argument('--in-process', action='store_true', help="drive an in-process app instead of a live server")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    return parser.parse_args()
+
 if __name__ == '__main__':
+    args = parse_args()
+    if args.workload:
+        load(args)
+        raise SystemExit(0)
+
     files = ''
     proceed = ''
     repo_set = set()
@@ -0,0 +1,123 @@
+import os
+import json
+import shutil
+import pandas as pd
+import utils.chunkstore as chunkstore
+import utils.utilfunctions as utilfunctions
+
+'''
+This module contains the durable checkpoints that make repository ingest resumable.
+
+While a repository is crawled through the GitHub API, the parsed commits are saved as Parquet chunks and the
+listing cursor (the SHAs of the current listing page and the URL of the next one) in a small state file.
+A retried or restarted ingest replays the saved commits and carries on from the cursor instead of starting over.
+'''
+
+#directory holding the ingest checkpoints, one sub-directory per repository
+CHECKPOINT_DIR = os.environ.get('EVNO_CHECKPOINT_DIR', 'checkpoints')
+
+
+class IngestCheckpoint:
+    '''
+    Saved progress of a repository ingest.
+
+    Parameters:
+    - directory (str): Directory of the checkpoint, created if missing.
+
+    Note:
+    - Commits are saved before the cursor moves past them, so a crash at any point loses at most the commits
+      of the listing page being fetched, which are fetched again on resume.
+    - Both the commit chunks and the state file are replaced atomically, readers never see partial files.
+
+    Raises:
+    - ValueError: If `directory` is not inside `CHECKPOINT_DIR`, since `clear` removes it.
+    '''
+    def __init__(self, directory):
+        if not utilfunctions.is_inside_dir(directory, CHECKPOINT_DIR):
+            raise ValueError(f"Checkpoint directory '{directory}' is outside of '{CHECKPOINT_DIR}'")
+        self.directory = directory
+        self.state_path = os.path.join(directory, 'state.json')
+        self.table = chunkstore.ChunkedTable(os.path.join(directory, 'commits'), root=CHECKPOINT_DIR)
+
+    def load(self):
+        '''
+        Returns the saved cursor, None if the ingest has not listed any page yet.
+
+        Returns:
+        - dict or None: {'shas': SHAs of the current listing page, 'next': URL of the next listing page or None}.
+        '''
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save_cursor(self, shas, next_url):
+        '''
+        Saves the listing cursor.
+
+        Parameters:
+        - shas (list): SHAs of the listing page being fetched.
+        - next_url (str or None): URL of the next listing page, None on the last page.
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'shas': shas, 'next': next_url}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    def save_commits(self, records):
+        '''
+        Saves a batch of parsed commit records.
+
+        Parameters:
+        - records (list of dict): Commit records as returned by `utilfunctions.parse_commit_record`.
+        '''
+        if len(records) > 0:
+            os.makedirs(self.table.directory, exist_ok=True)
+            self.table.write_chunk(pd.DataFrame(records))
+
+    def commits(self):
+        '''
+        Yields the saved commit records, one batch at a time.
+
+        Yields:
+        - list of dict: A batch of commit records.
+        '''
+        if not os.path.isdir(self.table.directory):
+            return
+        for chunk in self.table.iter_chunks():
+            yield chunk.to_dict(orient='records')
+
+    def shas(self):
+        '''
+        Returns the set of SHAs of the saved commits.
+        '''
+        if not os.path.isdir(self.table.directory):
+            return set()
+        return self.table.shas()
+
+    def clear(self):
+        '''
+        Removes the checkpoint, once the ingest succeeded or to start over.
+        '''
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def for_repo(username, repo_name):
+    '''
+    Returns the checkpoint of a repository's ingest.
+
+    Parameters:
+    - username (str): GitHub username or organization owning the repository.
+    - repo_name (str): Name of the repository.
+
+    Returns:
+    - IngestCheckpoint: The repository's checkpoint, empty if no ingest was interrupted.
+
+    Raises:
+    - ValueError: If the names would place the checkpoint outside of `CHECKPOINT_DIR`.
+    '''
+    return IngestCheckpoint(os.path.join(CHECKPOINT_DIR, username, repo_name))
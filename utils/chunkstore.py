@@ -0,0 +1,165 @@
+import os
+import shutil
+import pandas as pd
+import pyarrow.parquet as pq
+import utils.query as query
+import utils.utilfunctions as utilfunctions
+
+'''
+This module contains the on-disk commit tables used for very large repositories.
+
+A table is a directory of fixed-size Parquet chunks written during ingest. Searches and aggregations
+read one chunk at a time, so memory stays bounded by the chunk size rather than by the history size.
+'''
+
+#number of commits per chunk
+CHUNK_SIZE = int(os.environ.get('EVNO_CHUNK_SIZE', 1000))
+#directory holding the chunked tables, one sub-directory per repository
+STORE_DIR = os.environ.get('EVNO_STORE_DIR', 'store')
+
+
+class ChunkedTable:
+    '''
+    Commit table stored as a directory of Parquet chunks.
+
+    Parameters:
+    - directory (str): Directory of the table, created if missing.
+    - root (str, optional): Directory the table must be inside of, `STORE_DIR` by default.
+
+    Example:
+    ```
+    table = ChunkedTable('store/linux')
+    table.write_chunk(df)
+    for chunk in table.iter_chunks(columns=['sha', 'author']):
+        ...
+    ```
+
+    Note:
+    - The SHA set and row count are read once and then kept up to date by `write_chunk`.
+
+    Raises:
+    - ValueError: If `directory` does not resolve to a path inside `root`, since `clear` removes it.
+    '''
+    def __init__(self, directory, root=STORE_DIR):
+        self.directory = directory
+        self.root = root
+        self.check_directory()
+        os.makedirs(directory, exist_ok=True)
+        self._shas = None
+        self._rows = None
+
+    def check_directory(self):
+        '''
+        Raises a ValueError if the table's directory is not inside its root.
+        '''
+        if not utilfunctions.is_inside_dir(self.directory, self.root):
+            raise ValueError(f"Table directory '{self.directory}' is outside of '{self.root}'")
+
+    def parts(self):
+        '''
+        Returns the paths of the table's chunks in write order.
+        '''
+        return [os.path.join(self.directory, name) for name in sorted(os.listdir(self.directory)) if name.endswith('.parquet')]
+
+    def write_chunk(self, df):
+        '''
+        Appends a chunk of commits to the table.
+
+        Parameters:
+        - df (pd.DataFrame): DataFrame containing the commits of the chunk.
+
+        Returns:
+        - str: Path of the written chunk.
+        '''
+        path = os.path.join(self.directory, f'part-{len(self.parts()):06d}.parquet')
+        tmp_path = path + '.tmp'
+        df.reset_index(drop=True).to_parquet(tmp_path, index=False)
+        # Only complete chunks are ever visible to readers
+        os.replace(tmp_path, path)
+        if self._shas is not None:
+            self._shas.update(df['sha'])
+        if self._rows is not None:
+            self._rows += len(df)
+        return path
+
+    def iter_chunks(self, columns=None):
+        '''
+        Yields the table's chunks one at a time.
+
+        Parameters:
+        - columns (list, optional): Only read these columns.
+
+        Yields:
+        - pd.DataFrame: One chunk of commits.
+        '''
+        for path in self.parts():
+            chunk = pd.read_parquet(path, columns=columns)
+            if 'files' in chunk.columns:
+                # Parquet lists are read back as arrays
+                chunk['files'] = chunk['files'].map(list)
+            yield chunk
+
+    def shas(self):
+        '''
+        Returns the set of SHAs stored in the table.
+
+        Note:
+        - The set is cached and updated in place by `write_chunk`, copy it to iterate while chunks are written.
+        '''
+        if self._shas is None:
+            ret = set()
+            for chunk in self.iter_chunks(columns=['sha']):
+                ret.update(chunk['sha'])
+            self._shas = ret
+        return self._shas
+
+    def head(self, n=5):
+        '''
+        Returns the first `n` commits of the table.
+        '''
+        for chunk in self.iter_chunks():
+            return chunk.head(n)
+        return pd.DataFrame()
+
+    def __len__(self):
+        if self._rows is None:
+            self._rows = sum(pq.ParquetFile(path).metadata.num_rows for path in self.parts())
+        return self._rows
+
+    def disk_size(self):
+        '''
+        Returns the size of the table on disk in bytes.
+        '''
+        return sum(os.path.getsize(path) for path in self.parts())
+
+    def clear(self):
+        '''
+        Removes every chunk of the table.
+        '''
+        # The directory may have been swapped for a symlink since the table was opened
+        self.check_directory()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        self._shas = set()
+        self._rows = 0
+
+
+def filter_chunks(table, commit_query):
+    '''
+    Evaluates a filter chunk by chunk over a chunked table.
+
+    Parameters:
+    - table (ChunkedTable): Table to search.
+    - commit_query (query.Filter): Filter to evaluate.
+
+    Returns:
+    - pd.DataFrame: The matching commits of all chunks.
+    '''
+    matches = []
+    for chunk in table.iter_chunks():
+        match = query.run_query(query.CommitIndex(chunk), commit_query)
+        if len(match):
+            matches.append(match)
+    if len(matches) == 0:
+        return pd.DataFrame()
+    return pd.concat(matches, ignore_index=True)
@@ -0,0 +1,241 @@
+import json
+import random
+import threading
+import time
+import urllib.parse
+import numpy as np
+import requests
+from tabulate import tabulate
+import utils.throttle as throttle
+
+'''
+This module contains the scripted load generator used by the client.
+
+A workload is a JSON lines file of weighted operations. Workers pick operations at random according to their
+weights and send them at a global target rate, either to a live server or to an in-process app instance.
+'''
+
+#operations a workload can contain
+OPERATIONS = ['clone', 'search', 'group', 'query', 'activity', 'http']
+
+
+def load_workload(path):
+    '''
+    Reads a workload file.
+
+    Parameters:
+    - path (str): Path of a JSON lines file, one operation per line:
+      {"op": "search", "weight": 5, "params": {"repo": "flask", "author": "alice", "path_prefix": "src/flask/"}}
+
+    Returns:
+    - list of dict: The operations.
+
+    Raises:
+    - ValueError: If an operation is malformed.
+    '''
+    workload = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            entry = json.loads(line)
+            if entry.get('op') not in OPERATIONS:
+                raise ValueError(f"Line {number}: invalid op '{entry.get('op')}', expected one of {OPERATIONS}")
+            entry.setdefault('weight', 1)
+            entry.setdefault('params', {})
+            entry.setdefault('name', entry['op'])
+            try:
+                build_request(entry)
+            except (KeyError, ValueError) as e:
+                raise ValueError(f"Line {number}: invalid params for '{entry['op']}': {e}")
+            workload.append(entry)
+    if len(workload) == 0:
+        raise ValueError(f"Workload '{path}' is empty")
+    return workload
+
+def build_request(entry):
+    '''
+    Translates a workload operation into an HTTP request.
+
+    Parameters:
+    - entry (dict): Workload operation.
+
+    Returns:
+    - tuple: (method, path, json body or None).
+
+    Raises:
+    - ValueError: If a value sent as a path segment contains '/', which the server cannot route.
+    '''
+    params = entry['params']
+
+    def segment(key, default='None'):
+        value = str(params.get(key) or default)
+        # The server decodes %2F before routing, so a '/' can never stay inside its segment
+        if '/' in value:
+            raise ValueError(f"'{key}' cannot contain '/' in a URL path, use a 'query' operation instead")
+        # Quoted so '?', '#' and '%' stay inside the segment
+        return urllib.parse.quote(value, safe='')
+
+    def search_args():
+        args = {key: params[key] for key in ['path', 'path_prefix', 'path_glob', 'sentiment'] if params.get(key)}
+        return '?' + urllib.parse.urlencode(args) if args else ''
+
+    if entry['op'] == 'clone':
+        # One clone directory per repository, the server refuses to fetch another repository into an existing clone
+        dest = segment('dest', f"output-{params.get('username')}-{params.get('repo')}")
+        return 'GET', f"/clone/{segment('username')}/{segment('token')}/{segment('repo')}/{dest}/", None
+    if entry['op'] == 'search':
+        return 'GET', (f"/search/{segment('repo')}/{segment('sha')}/{segment('author')}/{segment('start_date')}/{segment('end_date')}"
+                       f"/{segment('msg')}/{segment('commiter')}/{'True' if params.get('analyze') else 'None'}{search_args()}"), None
+    if entry['op'] == 'group':
+        return 'GET', f"/group/{segment('username')}/{segment('token')}/{segment('repo')}/{segment('k', 2)}", None
+    if entry['op'] == 'query':
+        return 'POST', f"/query/{segment('repo')}", {'filter': params.get('filter'), 'analyze': params.get('analyze', False)}
+    if entry['op'] == 'activity':
+        return 'GET', (f"/activity/{segment('repo')}/{segment('by', 'author')}/{segment('granularity', 'week')}"
+                       f"/{segment('name')}/{segment('start_date')}/{segment('end_date')}"), None
+    return params.get('method', 'GET'), params['path'], params.get('json')
+
+
+class LiveSender:
+    '''
+    Sends requests to a running server, with one HTTP session per worker thread.
+    '''
+    def __init__(self, base):
+        self.base = base.rstrip('/')
+        self._local = threading.local()
+
+    def send(self, method, path, body):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        response = self._local.session.request(method, self.base + path, json=body)
+        return response.status_code, response.text
+
+
+class InProcessSender:
+    '''
+    Sends requests to an in-process Flask app through its test client.
+    '''
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def send(self, method, path, body):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.app.test_client()
+        response = self._local.client.open(path, method=method, json=body)
+        return response.status_code, response.get_data(as_text=True)
+
+
+def is_error(status, text):
+    '''
+    Returns True if a response is a failure: an HTTP error or an 'Error: ...' message from the server.
+
+    Note:
+    - The server's error strings are JSON encoded once by the resource and once more by flask_restful,
+      so the body is decoded until it is no longer a string.
+    '''
+    if status >= 400:
+        return True
+    try:
+        body = json.loads(text)
+        while isinstance(body, str) and not body.startswith('Error'):
+            body = json.loads(body)
+    except ValueError:
+        return False
+    return isinstance(body, str) and body.startswith('Error')
+
+def run_load(sender, workload, workers=4, rate=10, duration=10, max_requests=None, seed=None):
+    '''
+    Replays a workload from concurrent workers at a target rate.
+
+    Parameters:
+    - sender (LiveSender or InProcessSender): Where the requests go.
+    - workload (list): Operations as returned by `load_workload`.
+    - workers (int): Number of concurrent workers.
+    - rate (float): Target number of requests per second across all workers, 0 for as fast as possible.
+    - duration (float): Seconds to run for.
+    - max_requests (int, optional): Stop after this many requests.
+    - seed (int, optional): Seed of the operation picker, for reproducible runs.
+
+    Returns:
+    - tuple: (dict mapping operation name to a list of (latency, failed) samples, elapsed seconds).
+    '''
+    bucket = throttle.TokenBucket(rate, capacity=1)
+    picker = random.Random(seed)
+    picker_lock = threading.Lock()
+    weights = [entry['weight'] for entry in workload]
+    samples = {entry['name']: [] for entry in workload}
+    samples_lock = threading.Lock()
+    issued = [0]
+    deadline = time.monotonic() + duration
+
+    def worker():
+        while time.monotonic() < deadline:
+            bucket.acquire()
+            with picker_lock:
+                if max_requests is not None and issued[0] >= max_requests:
+                    return
+                issued[0] += 1
+                entry = picker.choices(workload, weights)[0]
+            method, path, body = build_request(entry)
+            start = time.perf_counter()
+            try:
+                status, text = sender.send(method, path, body)
+                failed = is_error(status, text)
+            except requests.exceptions.RequestException:
+                failed = True
+            latency = time.perf_counter() - start
+            with samples_lock:
+                samples[entry['name']].append((latency, failed))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+def summarize(samples, elapsed):
+    '''
+    Computes per operation throughput, error rate and latency percentiles.
+
+    Parameters:
+    - samples (dict): Samples as returned by `run_load`.
+    - elapsed (float): Duration of the run in seconds.
+
+    Returns:
+    - list of dict: One row per operation plus a 'total' row.
+    '''
+    rows = []
+    everything = []
+    for name, values in list(samples.items()) + [('total', None)]:
+        values = everything if values is None else values
+        if name != 'total':
+            everything.extend(values)
+        if len(values) == 0:
+            continue
+        latencies = np.array([latency for latency, _ in values]) * 1000
+        errors = sum(1 for _, failed in values if failed)
+        rows.append({
+            'operation': name,
+            'requests': len(values),
+            'req/s': round(len(values) / elapsed, 2),
+            'error %': round(100 * errors / len(values), 2),
+            'p50 ms': round(float(np.percentile(latencies, 50)), 2),
+            'p90 ms': round(float(np.percentile(latencies, 90)), 2),
+            'p99 ms': round(float(np.percentile(latencies, 99)), 2),
+            'max ms': round(float(latencies.max()), 2),
+        })
+    return rows
+
+def print_report(rows):
+    '''
+    Prints a load report as a table.
+    '''
+    if len(rows) == 0:
+        print("No requests were sent")
+        return
+    print(tabulate(rows, headers='keys', tablefmt='fancy_grid'))
@@ -0,0 +1,194 @@
+import threading
+import time
+from contextlib import contextmanager
+
+'''
+This module contains the server's timing instrumentation.
+
+Counters, gauges and histograms are kept in process and rendered in the Prometheus text exposition format by `render`.
+Stage timings are labelled with the endpoint of the request being served, set per thread by `set_endpoint`.
+'''
+
+#default histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+_registry = []
+_local = threading.local()
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Metric:
+    '''
+    Base class of all metrics. Values are stored per tuple of label values.
+    '''
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            entry = self._values[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['counts'][i] += 1
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            for key, entry in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, entry['counts']):
+                    labels = _format_labels(self.labelnames + ('le',), key + (bound,))
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = _format_labels(self.labelnames + ('le',), key + ('+Inf',))
+                lines.append(f'{self.name}_bucket{labels} {entry["count"]}')
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {entry["sum"]}')
+                lines.append(f'{self.name}_count{labels} {entry["count"]}')
+        return lines
+
+
+#Metrics exposed by the server
+STAGE_SECONDS = Histogram('evno_stage_seconds', 'Time spent in each processing stage.', ['endpoint', 'stage'])
+STAGE_ERRORS = Counter('evno_stage_errors_total', 'Processing stages that raised an exception.', ['endpoint', 'stage'])
+GITHUB_REQUEST_SECONDS = Histogram('evno_github_request_seconds', 'Latency of GitHub HTTP calls.', ['endpoint', 'status'])
+GITHUB_REQUESTS = Counter('evno_github_requests_total', 'GitHub HTTP calls by response status.', ['endpoint', 'status'])
+REQUEST_SECONDS = Histogram('evno_request_seconds', 'Latency of requests served by the server.', ['endpoint', 'status'])
+REPO_ROWS = Gauge('evno_repo_rows', 'Number of commits held for a repository.', ['repo'])
+REPO_MEMORY_BYTES = Gauge('evno_repo_memory_bytes', 'Memory used by the commit table of a repository.', ['repo'])
+REPO_DISK_BYTES = Gauge('evno_repo_disk_bytes', 'Disk space used by the chunked commit table of a repository.', ['repo'])
+
+
+def set_endpoint(endpoint):
+    '''
+    Sets the endpoint label used by stage timings on the current thread.
+    '''
+    _local.endpoint = endpoint
+
+def get_endpoint():
+    '''
+    Returns the endpoint label of the current thread, 'none' outside of a request.
+    '''
+    return getattr(_local, 'endpoint', None) or 'none'
+
+@contextmanager
+def stage_timer(stage):
+    '''
+    Context manager timing a processing stage.
+
+    Parameters:
+    - stage (str): Name of the stage (e.g. 'parse', 'concat', 'query', 'sentiment', 'kmeans_fit').
+
+    Example:
+    ```
+    with stage_timer('concat'):
+        df = pd.concat(df_list, ignore_index=True)
+    ```
+    '''
+    endpoint = get_endpoint()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(endpoint=endpoint, stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, stage=stage)
+
+def observe_github_request(status, seconds):
+    '''
+    Records the status and latency of a GitHub HTTP call.
+
+    Parameters:
+    - status (int or str): HTTP status code, or 'error' if the call raised.
+    - seconds (float): Latency of the call.
+    '''
+    endpoint = get_endpoint()
+    GITHUB_REQUESTS.inc(endpoint=endpoint, status=status)
+    GITHUB_REQUEST_SECONDS.observe(seconds, endpoint=endpoint, status=status)
+
+def record_repo_size(repo_name, df):
+    '''
+    Updates the row count and memory gauges of a repository.
+
+    Parameters:
+    - repo_name (str): Name of the repository.
+    - df (pd.DataFrame): DataFrame containing the commit history.
+    '''
+    REPO_ROWS.set(len(df), repo=repo_name)
+    REPO_MEMORY_BYTES.set(int(df.memory_usage(deep=True).sum()), repo=repo_name)
+
+def render():
+    '''
+    Renders every registered metric in the Prometheus text exposition format.
+
+    Returns:
+    - str: The exposition text.
+    '''
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,207 @@
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+'''
+This module contains the opt-in per-request profiler of the server.
+
+A request is profiled when it carries the `X-Evno-Profile` header or the `profile` query flag,
+or when it is picked by the `EVNO_PROFILE_SAMPLE_RATE` sampling rate. Profiles are written to a bounded
+on-disk ring buffer together with the request's repository and parameters.
+'''
+
+#header and query flag enabling profiling, values: 'cprofile' (deterministic) or 'sample' (stack sampling)
+PROFILE_HEADER = 'X-Evno-Profile'
+PROFILE_ARG = 'profile'
+PROFILE_MODES = ['cprofile', 'sample']
+#flag values requesting the default 'cprofile' mode
+PROFILE_TRUE_VALUES = ['1', 'true', 'yes', 'on']
+#request parameters never written to profile metadata
+REDACTED_KEYS = ['token']
+
+PROFILE_DIR = os.environ.get('EVNO_PROFILE_DIR', 'profiles')
+PROFILE_MAX_FILES = int(os.environ.get('EVNO_PROFILE_MAX_FILES', 50))
+PROFILE_SAMPLE_RATE = float(os.environ.get('EVNO_PROFILE_SAMPLE_RATE', 0))
+#interval between two stack samples in seconds
+SAMPLE_INTERVAL = float(os.environ.get('EVNO_PROFILE_SAMPLE_INTERVAL', 0.005))
+
+
+def requested_mode(headers, args):
+    '''
+    Returns the profiling mode requested for a request, if any.
+
+    Parameters:
+    - headers (Mapping): Request headers.
+    - args (Mapping): Request query arguments.
+
+    Returns:
+    - str or None: 'cprofile', 'sample' or None if the request should not be profiled.
+
+    Note:
+    - Only a mode name or a true flag value ('1', 'true', 'yes', 'on') enables profiling, any other value
+      (e.g. '0' or 'false') leaves the request to the sampling rate.
+    '''
+    mode = (headers.get(PROFILE_HEADER) or args.get(PROFILE_ARG) or '').strip().lower()
+    if mode in PROFILE_MODES:
+        return mode
+    if mode in PROFILE_TRUE_VALUES:
+        return 'cprofile'
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return 'sample'
+    return None
+
+
+class DeterministicProfiler:
+    '''
+    Wraps cProfile for the calling thread.
+    '''
+    extension = 'prof'
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def dump(self, path):
+        self.profiler.dump_stats(path)
+
+
+class SamplingProfiler:
+    '''
+    Samples the stack of one thread from a background thread and aggregates it as folded stacks.
+
+    Note:
+    - The output is one 'frame;frame;frame count' line per distinct stack, the input format of flamegraph tools.
+    '''
+    extension = 'folded'
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+def make_profiler(mode):
+    '''
+    Creates a profiler for the given mode.
+
+    Parameters:
+    - mode (str): 'cprofile' or 'sample'.
+
+    Returns:
+    - DeterministicProfiler or SamplingProfiler: The started profiler.
+    '''
+    profiler = SamplingProfiler() if mode == 'sample' else DeterministicProfiler()
+    profiler.start()
+    return profiler
+
+def redact(params):
+    '''
+    Returns a copy of request parameters without secrets.
+    '''
+    return {key: ('***' if key in REDACTED_KEYS else value) for key, value in (params or {}).items()}
+
+
+class ProfileStore:
+    '''
+    Bounded on-disk ring buffer of profile files.
+
+    Parameters:
+    - directory (str): Directory the profiles are written to.
+    - max_files (int): Number of profiles kept, the oldest are removed first.
+
+    Note:
+    - Every profile `<name>.<ext>` has a `<name>.json` metadata file next to it.
+    '''
+    def __init__(self, directory=PROFILE_DIR, max_files=PROFILE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def save(self, profiler, metadata):
+        '''
+        Writes a stopped profiler and its metadata, then prunes the buffer.
+
+        Returns:
+        - str: Name of the stored profile file.
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        stem = f'{time.strftime("%Y%m%dT%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        name = f'{stem}.{profiler.extension}'
+        profiler.dump(os.path.join(self.directory, name))
+        metadata = dict(metadata, file=name, created=time.time())
+        with open(os.path.join(self.directory, f'{stem}.json'), 'w') as f:
+            json.dump(metadata, f)
+        self.prune()
+        return name
+
+    def list(self):
+        '''
+        Returns the metadata of all stored profiles, newest first.
+        '''
+        if not os.path.isdir(self.directory):
+            return []
+        ret = []
+        for entry in os.listdir(self.directory):
+            if not entry.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, entry)) as f:
+                    ret.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(ret, key=lambda m: m.get('created', 0), reverse=True)
+
+    def prune(self):
+        with self._lock:
+            for metadata in self.list()[self.max_files:]:
+                stem = os.path.splitext(metadata['file'])[0]
+                for name in (metadata['file'], f'{stem}.json'):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+    def path(self, name):
+        '''
+        Returns the path of a stored profile, or None if there is no such profile.
+        '''
+        if os.path.basename(name) != name or name.endswith('.json'):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,573 @@
+import re
+import copy
+import bisect
+import fnmatch
+import itertools
+import numpy as np
+import pandas as pd
+
+'''
+This module contains the commit query engine used by the server.
+
+Filters are composed with `&`, `|` and `~` and evaluated against a `CommitIndex`,
+which caches lowered columns, parsed dates, value -> row postings and a `PathIndex` over the touched files
+of a commit DataFrame. User input is never interpolated into an expression string.
+'''
+
+#columns that can be filtered on
+QUERY_COLUMNS = ['sha', 'author', 'committer', 'msg']
+
+
+class CommitIndex:
+    '''
+    Lazily built lookup structures over a commit DataFrame.
+
+    Parameters:
+    - df (pd.DataFrame): DataFrame containing commit history.
+
+    Note:
+    - Lowered columns, parsed dates and postings are computed on first use and cached.
+    - The index must be rebuilt, or `extended` for appended commits, when the underlying DataFrame changes.
+    '''
+    def __init__(self, df):
+        self.df = df
+        self._lowered = {}
+        self._postings = {}
+        self._dates = None
+        self._timestamps = None
+        self._paths = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def column(self, name, ignore_case=False):
+        '''
+        Returns a column as a string Series, lowered if `ignore_case` is set.
+        '''
+        if name not in self.df.columns:
+            raise ValueError(f"Unknown column '{name}'")
+        if not ignore_case:
+            return self.df[name].astype(str)
+        if name not in self._lowered:
+            self._lowered[name] = self.df[name].astype(str).str.lower()
+        return self._lowered[name]
+
+    def postings(self, name, ignore_case=False):
+        '''
+        Returns a dict mapping each distinct value of a column to the array of row positions holding it.
+        '''
+        key = (name, ignore_case)
+        if key not in self._postings:
+            values = self.column(name, ignore_case)
+            self._postings[key] = pd.Series(np.arange(len(values))).groupby(values.to_numpy()).indices
+        return self._postings[key]
+
+    def dates(self):
+        '''
+        Returns the 'date' column parsed to UTC timestamps.
+        '''
+        if self._dates is None:
+            self._dates = pd.to_datetime(self.df['date'], utc=True, errors='coerce')
+        return self._dates
+
+    def timestamps(self):
+        '''
+        Returns the 'date' column as int64 nanoseconds since the epoch (UTC), undated commits sort first.
+        '''
+        if self._timestamps is None:
+            naive = self.dates().dt.tz_localize(None)
+            self._timestamps = naive.to_numpy(dtype='datetime64[ns]').astype('int64')
+        return self._timestamps
+
+    def paths(self, ignore_case=False):
+        '''
+        Returns the `PathIndex` over the 'files' column, over the lowered paths if `ignore_case` is set.
+        '''
+        if ignore_case not in self._paths:
+            self._paths[ignore_case] = PathIndex(self.df['files'] if 'files' in self.df.columns else [], ignore_case)
+        return self._paths[ignore_case]
+
+    def extended(self, new_df):
+        '''
+        Returns an index over this index's commits followed by `new_df`, this index is left unchanged for its readers.
+
+        Parameters:
+        - new_df (pd.DataFrame): Appended commits, with the same columns.
+
+        Returns:
+        - CommitIndex: The new index.
+
+        Note:
+        - The structures already built are carried over by indexing the appended rows only and merging them in,
+          so the cost follows the number of appended commits rather than the history size (but for the DataFrame
+          itself, which is concatenated).
+        '''
+        offset = len(self.df)
+        ret = CommitIndex(pd.concat([self.df, new_df], ignore_index=True))
+        appended = CommitIndex(new_df.reset_index(drop=True))
+        for (name, ignore_case), postings in self._postings.items():
+            merged = dict(postings)
+            for value, positions in appended.postings(name, ignore_case).items():
+                positions = positions + offset
+                merged[value] = np.concatenate([merged[value], positions]) if value in merged else positions
+            ret._postings[(name, ignore_case)] = merged
+        for name, lowered in self._lowered.items():
+            ret._lowered[name] = pd.concat([lowered, appended.column(name, True)], ignore_index=True)
+        if self._dates is not None:
+            ret._dates = pd.concat([self._dates, appended.dates()], ignore_index=True)
+        if self._timestamps is not None:
+            ret._timestamps = np.concatenate([self._timestamps, appended.timestamps()])
+        for ignore_case, paths in self._paths.items():
+            ret._paths[ignore_case] = paths.extended(new_df['files'] if 'files' in new_df.columns else [[]] * len(new_df))
+        return ret
+
+    def select(self, mask):
+        '''
+        Returns the rows of the DataFrame selected by a boolean mask.
+        '''
+        return self.df[mask]
+
+
+class PathIndex:
+    '''
+    Path -> commit postings over the files touched by each commit.
+
+    Parameters:
+    - files (iterable of list): Touched paths of each commit, in row order.
+    - ignore_case (bool, optional): Index the lowered paths, lookups must then be lowered too.
+
+    Note:
+    - Every distinct path is stored once and commits refer to it by its id. A sorted copy of the paths maps to their ids.
+    - Since the paths are sorted, all the paths below a directory (or starting with the literal part of a glob)
+      form one contiguous range found by binary search, so lookups cost the number of matching paths and
+      commits, not the number of commits times files.
+    - `extended` indexes appended commits without rebuilding the existing postings.
+    '''
+    def __init__(self, files, ignore_case=False):
+        self.ignore_case = ignore_case
+        files = self._normalize(files)
+        lengths = np.fromiter((len(paths) for paths in files), dtype=np.int64, count=len(files))
+        flat = list(itertools.chain.from_iterable(files))
+        #row position of each (commit, path) pair and the id of its path
+        self.rows = np.repeat(np.arange(len(files)), lengths)
+        self.codes, uniques = pd.factorize(pd.Series(flat, dtype=object), sort=True)
+        self.path_list = [str(path) for path in uniques]
+        self.ids = {path: i for i, path in enumerate(self.path_list)}
+        #paths in sorted order and their ids, the paths are sorted at first and new ones are inserted in place
+        self.sorted_paths = list(self.path_list)
+        self.sorted_ids = list(range(len(self.path_list)))
+        order = np.argsort(self.codes, kind='stable')
+        self.counts = np.bincount(self.codes, minlength=len(self.path_list))
+        self._postings = np.split(self.rows[order], np.cumsum(self.counts)[:-1]) if len(self.path_list) else []
+        self.num_rows = len(files)
+
+    def __len__(self):
+        return len(self.path_list)
+
+    def _normalize(self, files):
+        if self.ignore_case:
+            return [[str(path).lower() for path in paths] for paths in files]
+        return list(files)
+
+    def postings(self, path):
+        '''
+        Returns the row positions of the commits touching `path`.
+        '''
+        i = self.ids.get(path)
+        return self._postings[i] if i is not None else np.array([], dtype=np.int64)
+
+    def extended(self, files):
+        '''
+        Returns a new index with appended commits, this one is left unchanged for its readers.
+
+        Parameters:
+        - files (iterable of list): Touched paths of each appended commit, in row order.
+
+        Returns:
+        - PathIndex: Index over the rows of this index followed by the appended ones.
+
+        Note:
+        - Only the postings of the paths the appended commits touch are copied, the rest are shared.
+        '''
+        files = self._normalize(files)
+        ret = copy.copy(self)
+        ret.path_list = list(self.path_list)
+        ret.ids = dict(self.ids)
+        ret.sorted_paths = list(self.sorted_paths)
+        ret.sorted_ids = list(self.sorted_ids)
+        ret._postings = list(self._postings)
+        rows, codes, touched = [], [], {}
+        for row, paths in enumerate(files, self.num_rows):
+            for path in paths:
+                path = str(path)
+                i = ret.ids.get(path)
+                if i is None:
+                    i = len(ret.path_list)
+                    ret.path_list.append(path)
+                    ret.ids[path] = i
+                    k = bisect.bisect_left(ret.sorted_paths, path)
+                    ret.sorted_paths.insert(k, path)
+                    ret.sorted_ids.insert(k, i)
+                    ret._postings.append(np.array([], dtype=np.int64))
+                rows.append(row)
+                codes.append(i)
+                touched.setdefault(i, []).append(row)
+        for i, new_rows in touched.items():
+            ret._postings[i] = np.concatenate([ret._postings[i], np.array(new_rows, dtype=np.int64)])
+        ret.rows = np.concatenate([self.rows, np.array(rows, dtype=self.rows.dtype)])
+        ret.codes = np.concatenate([self.codes, np.array(codes, dtype=self.codes.dtype)])
+        ret.counts = np.concatenate([self.counts, np.zeros(len(ret.path_list) - len(self.path_list), dtype=self.counts.dtype)])
+        np.add.at(ret.counts, np.array(codes, dtype=np.int64), 1)
+        ret.num_rows = self.num_rows + len(files)
+        return ret
+
+    def range(self, prefix):
+        '''
+        Returns the (start, end) range of sorted positions of the paths starting with `prefix`.
+        '''
+        start = bisect.bisect_left(self.sorted_paths, prefix)
+        # U+10FFFF sorts after every character a path can contain
+        end = bisect.bisect_left(self.sorted_paths, prefix + '\U0010ffff', lo=start)
+        return start, end
+
+    def under(self, directory):
+        '''
+        Returns the ids of the paths inside `directory` (at any depth), in path order.
+        '''
+        directory = directory.strip('/')
+        if not directory:
+            return list(self.sorted_ids)
+        start, end = self.range(directory + '/')
+        return self.sorted_ids[start:end]
+
+    def glob(self, pattern):
+        '''
+        Returns the ids of the paths matching the shell-style `pattern` (`*` also matches '/'), in path order.
+        '''
+        literal = re.split(r'[*?\[]', pattern, maxsplit=1)[0]
+        regex = re.compile(fnmatch.translate(pattern))
+        start, end = self.range(literal)
+        return [self.sorted_ids[k] for k in range(start, end) if regex.match(self.sorted_paths[k])]
+
+    def mask(self, ids):
+        '''
+        Returns the boolean row mask of the commits touching any of the path ids.
+        '''
+        ret = np.zeros(self.num_rows, dtype=bool)
+        if len(ids):
+            ret[np.concatenate([self._postings[i] for i in ids])] = True
+        return ret
+
+    def churn(self, row_mask=None):
+        '''
+        Returns the number of commits touching each path.
+
+        Parameters:
+        - row_mask (np.ndarray, optional): Only count the commits selected by this boolean mask.
+
+        Returns:
+        - np.ndarray: Commit count of each path id.
+        '''
+        if row_mask is None:
+            return self.counts
+        return np.bincount(self.codes[row_mask[self.rows]], minlength=len(self.path_list))
+
+
+class Filter:
+    '''
+    Base class of all query filters. Subclasses implement `mask`.
+    '''
+    def mask(self, index):
+        raise NotImplementedError
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+
+class All(Filter):
+    '''
+    Matches every commit.
+    '''
+    def mask(self, index):
+        return np.ones(len(index), dtype=bool)
+
+
+class In(Filter):
+    '''
+    Matches commits whose column value is one of `values`.
+    '''
+    def __init__(self, column, values, ignore_case=False):
+        self.column = column
+        self.values = [str(value) for value in values]
+        self.ignore_case = ignore_case
+
+    def mask(self, index):
+        postings = index.postings(self.column, self.ignore_case)
+        ret = np.zeros(len(index), dtype=bool)
+        for value in self.values:
+            value = value.lower() if self.ignore_case else value
+            if value in postings:
+                ret[postings[value]] = True
+        return ret
+
+
+class Eq(In):
+    '''
+    Matches commits whose column value equals `value`.
+    '''
+    def __init__(self, column, value, ignore_case=False):
+        super().__init__(column, [value], ignore_case)
+
+
+class Prefix(Filter):
+    '''
+    Matches commits whose column value starts with `prefix`.
+    '''
+    def __init__(self, column, prefix, ignore_case=False):
+        self.column = column
+        self.prefix = str(prefix)
+        self.ignore_case = ignore_case
+
+    def mask(self, index):
+        prefix = self.prefix.lower() if self.ignore_case else self.prefix
+        return index.column(self.column, self.ignore_case).str.startswith(prefix).to_numpy(dtype=bool)
+
+
+class Contains(Filter):
+    '''
+    Matches commits whose column value contains `substring` literally.
+    '''
+    def __init__(self, column, substring, ignore_case=False):
+        self.column = column
+        self.substring = str(substring)
+        self.ignore_case = ignore_case
+
+    def mask(self, index):
+        substring = self.substring.lower() if self.ignore_case else self.substring
+        return index.column(self.column, self.ignore_case).str.contains(substring, regex=False).to_numpy(dtype=bool)
+
+
+class Regex(Filter):
+    '''
+    Matches commits whose column value matches the regular expression `pattern`.
+
+    Raises:
+    - ValueError: If the pattern is not a valid regular expression.
+    '''
+    def __init__(self, column, pattern, ignore_case=False):
+        try:
+            self.pattern = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression '{pattern}': {e}")
+        self.column = column
+
+    def mask(self, index):
+        return index.column(self.column).str.contains(self.pattern, regex=True).to_numpy(dtype=bool)
+
+
+class DateRange(Filter):
+    '''
+    Matches commits dated between `start` and `end` (both inclusive, either may be None).
+
+    Raises:
+    - ValueError: If a bound is not a valid date.
+    '''
+    def __init__(self, start=None, end=None):
+        self.start = pd.to_datetime(start, utc=True) if start else None
+        self.end = pd.to_datetime(end, utc=True) if end else None
+
+    def mask(self, index):
+        dates = index.dates()
+        ret = np.ones(len(index), dtype=bool)
+        if self.start is not None:
+            ret &= (dates >= self.start).to_numpy(dtype=bool)
+        if self.end is not None:
+            ret &= (dates <= self.end).to_numpy(dtype=bool)
+        return ret
+
+
+class PathIn(Filter):
+    '''
+    Matches commits touching one of `paths`.
+    '''
+    def __init__(self, column, paths, ignore_case=False):
+        self.ignore_case = ignore_case
+        self.paths = [str(path).lower() if ignore_case else str(path) for path in paths]
+
+    def mask(self, index):
+        paths = index.paths(self.ignore_case)
+        return paths.mask([paths.ids[path] for path in self.paths if path in paths.ids])
+
+
+class PathEq(PathIn):
+    '''
+    Matches commits touching `path`.
+    '''
+    def __init__(self, column, path, ignore_case=False):
+        super().__init__(column, [path], ignore_case)
+
+
+class PathPrefix(Filter):
+    '''
+    Matches commits touching a file inside the directory `directory` (e.g. 'src/core/').
+    '''
+    def __init__(self, column, directory, ignore_case=False):
+        self.ignore_case = ignore_case
+        self.directory = str(directory).lower() if ignore_case else str(directory)
+
+    def mask(self, index):
+        paths = index.paths(self.ignore_case)
+        return paths.mask(paths.under(self.directory))
+
+
+class PathGlob(Filter):
+    '''
+    Matches commits touching a file matching the shell-style `pattern` (e.g. 'src/*.py', `*` also matches '/').
+    '''
+    def __init__(self, column, pattern, ignore_case=False):
+        self.ignore_case = ignore_case
+        self.pattern = str(pattern).lower() if ignore_case else str(pattern)
+
+    def mask(self, index):
+        paths = index.paths(self.ignore_case)
+        return paths.mask(paths.glob(self.pattern))
+
+
+class And(Filter):
+    def __init__(self, *filters):
+        self.filters = filters
+
+    def mask(self, index):
+        ret = np.ones(len(index), dtype=bool)
+        for f in self.filters:
+            ret &= f.mask(index)
+        return ret
+
+
+class Or(Filter):
+    def __init__(self, *filters):
+        self.filters = filters
+
+    def mask(self, index):
+        ret = np.zeros(len(index), dtype=bool)
+        for f in self.filters:
+            ret |= f.mask(index)
+        return ret
+
+
+class Not(Filter):
+    def __init__(self, inner):
+        self.inner = inner
+
+    def mask(self, index):
+        return ~self.inner.mask(index)
+
+
+#operators accepted by `parse_filter`
+OPERATORS = {
+    'eq': Eq,
+    'in': In,
+    'prefix': Prefix,
+    'contains': Contains,
+    'regex': Regex,
+}
+#operators accepted by `parse_filter` on the 'path' field, matching the files touched by a commit
+PATH_OPERATORS = {
+    'eq': PathEq,
+    'in': PathIn,
+    'prefix': PathPrefix,
+    'glob': PathGlob,
+}
+
+def parse_filter(spec):
+    '''
+    Builds a Filter from a JSON-like specification.
+
+    Parameters:
+    - spec (dict): Filter specification. Either a combinator ({"and": [...]}, {"or": [...]}, {"not": {...}}),
+      a date range ({"date": {"start": "yyyy-mm-dd", "end": "yyyy-mm-dd"}}) or a column condition
+      ({"field": "author", "op": "eq", "value": "...", "ignore_case": false}). The 'path' field matches the files
+      touched by a commit with the operators of `PATH_OPERATORS`.
+
+    Returns:
+    - Filter: The composed filter.
+
+    Raises:
+    - ValueError: If the specification is malformed.
+
+    Example:
+    ```
+    spec = {"and": [{"field": "author", "op": "in", "value": ["alice", "bob"]},
+                    {"not": {"field": "msg", "op": "prefix", "value": "Merge", "ignore_case": true}}]}
+    f = parse_filter(spec)
+    ```
+    '''
+    if not spec:
+        return All()
+    if not isinstance(spec, dict):
+        raise ValueError(f"Invalid filter: {spec}")
+    if 'and' in spec:
+        return And(*[parse_filter(s) for s in spec['and']])
+    if 'or' in spec:
+        return Or(*[parse_filter(s) for s in spec['or']])
+    if 'not' in spec:
+        return Not(parse_filter(spec['not']))
+    if 'date' in spec:
+        return DateRange(spec['date'].get('start'), spec['date'].get('end'))
+
+    field = spec.get('field')
+    op = spec.get('op', 'eq')
+    operators = OPERATORS
+    if field == 'path':
+        operators = PATH_OPERATORS
+    elif field not in QUERY_COLUMNS:
+        raise ValueError(f"Invalid field '{field}', expected one of {QUERY_COLUMNS + ['path']}")
+    if op not in operators:
+        raise ValueError(f"Invalid operator '{op}' for field '{field}', expected one of {list(operators.keys())}")
+    value = spec.get('value')
+    if op == 'in' and not isinstance(value, list):
+        raise ValueError("Operator 'in' expects a list value")
+    if value is None:
+        raise ValueError(f"Missing value for field '{field}'")
+    return operators[op](field, value, bool(spec.get('ignore_case', False)))
+
+def run_query(index, query):
+    '''
+    Evaluates a filter against a commit index.
+
+    Parameters:
+    - index (CommitIndex): Index over the commit DataFrame.
+    - query (Filter): Filter to evaluate.
+
+    Returns:
+    - pd.DataFrame: The matching commits.
+    '''
+    return index.select(query.mask(index))
+
+def path_churn(index, commit_query=None, directory=None, pattern=None):
+    '''
+    Counts the commits touching each file.
+
+    Parameters:
+    - index (CommitIndex): Index over the commit DataFrame.
+    - commit_query (Filter, optional): Only count the commits matching this filter.
+    - directory (str, optional): Only count the files inside this directory.
+    - pattern (str, optional): Only count the files matching this shell-style pattern.
+
+    Returns:
+    - pd.Series: Number of commits per path, for the paths touched at least once.
+    '''
+    paths = index.paths()
+    counts = paths.churn(None if commit_query is None else commit_query.mask(index))
+    ids = np.array(paths.under(directory or ''), dtype=np.int64)
+    if pattern:
+        ids = ids[np.isin(ids, paths.glob(pattern))]
+    ids = ids[counts[ids] > 0]
+    return pd.Series(counts[ids], index=[paths.path_list[i] for i in ids], dtype=np.int64)
+
@@ -0,0 +1,153 @@
+import pandas as pd
+
+'''
+This module contains the commit activity rollups served by the server.
+
+A rollup table holds commits and line counts per (name, bucket) for one granularity and one dimension.
+Tables are built once at ingest and updated incrementally as new commits arrive,
+so serving a time series costs O(buckets) instead of O(commits).
+'''
+
+#time bucket granularities
+GRANULARITIES = ['day', 'week', 'month']
+#dimensions activity can be grouped by, 'repo' groups all commits of the repository together
+DIMENSIONS = ['author', 'committer', 'repo']
+#rollup metric -> commit DataFrame column
+METRICS = {'added': '#added', 'deleted': '#deleted', 'changed': '#lines changed'}
+
+
+def parse_dates(dates):
+    '''
+    Parses commit dates to UTC timestamps without timezone, unparseable dates become NaT.
+
+    Parameters:
+    - dates (pd.Series): Dates (ISO 8601 strings, with or without timezone).
+
+    Returns:
+    - pd.Series: Timestamps (UTC, timezone naive).
+    '''
+    return pd.to_datetime(dates, utc=True, errors='coerce').dt.tz_localize(None)
+
+def get_buckets(dates, granularity):
+    '''
+    Maps commit dates to the start of their time bucket.
+
+    Parameters:
+    - dates (pd.Series): Commit dates (ISO 8601 strings).
+    - granularity (str): One of 'day', 'week' or 'month'.
+
+    Returns:
+    - pd.Series: Bucket start timestamps (UTC, timezone naive).
+    '''
+    dates = parse_dates(dates)
+    if granularity == 'day':
+        return dates.dt.floor('D')
+    if granularity == 'week':
+        return dates.dt.to_period('W').dt.start_time
+    return dates.dt.to_period('M').dt.start_time
+
+def rollup_table(df, repo_name, granularity, by):
+    '''
+    Aggregates a commit DataFrame into a single rollup table.
+
+    Parameters:
+    - df (pd.DataFrame): DataFrame containing commit history.
+    - repo_name (str): Name of the repository, used as the key when `by` is 'repo'.
+    - granularity (str): One of 'day', 'week' or 'month'.
+    - by (str): One of 'author', 'committer' or 'repo'.
+
+    Returns:
+    - pd.DataFrame: Table indexed by (name, bucket) with 'commits', 'added', 'deleted' and 'changed' columns.
+    '''
+    table = pd.DataFrame({
+        'name': df[by].astype(str) if by != 'repo' else repo_name,
+        'bucket': get_buckets(df['date'], granularity),
+        'commits': 1,
+    }, index=df.index)
+    for metric, column in METRICS.items():
+        table[metric] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype('int64')
+    table = table.dropna(subset=['bucket'])
+    return table.groupby(['name', 'bucket']).sum().sort_index()
+
+def build_rollups(df, repo_name):
+    '''
+    Builds every rollup table for a repository.
+
+    Parameters:
+    - df (pd.DataFrame): DataFrame containing commit history.
+    - repo_name (str): Name of the repository.
+
+    Returns:
+    - dict: Rollup tables keyed by (granularity, dimension).
+    '''
+    return {(granularity, by): rollup_table(df, repo_name, granularity, by)
+            for granularity in GRANULARITIES for by in DIMENSIONS}
+
+def update_rollups(rollups, new_df, repo_name):
+    '''
+    Adds newly arrived commits to existing rollup tables in place.
+
+    Parameters:
+    - rollups (dict): Rollup tables as returned by `build_rollups`.
+    - new_df (pd.DataFrame): DataFrame containing only the new commits.
+    - repo_name (str): Name of the repository.
+
+    Returns:
+    - dict: The updated rollup tables.
+    '''
+    if len(new_df) == 0:
+        return rollups
+    for key, table in rollups.items():
+        delta = rollup_table(new_df, repo_name, *key)
+        rollups[key] = table.add(delta, fill_value=0).astype('int64').sort_index()
+    return rollups
+
+def query_rollups(rollups, granularity, by, name=None, start_date=None, end_date=None):
+    '''
+    Returns an activity time series from the rollup tables.
+
+    Parameters:
+    - rollups (dict): Rollup tables as returned by `build_rollups`.
+    - granularity (str): One of 'day', 'week' or 'month'.
+    - by (str): One of 'author', 'committer' or 'repo'.
+    - name (str, optional): Only return the series of this author/committer.
+    - start_date (str, optional): Only return buckets ending on or after this date (yyyy-mm-dd).
+    - end_date (str, optional): Only return buckets starting on or before this date (yyyy-mm-dd).
+
+    Returns:
+    - list of dict: One record per (name, bucket) with the bucket start date and the aggregated metrics.
+
+    Raises:
+    - ValueError: If the granularity, dimension or dates are invalid.
+
+    Note:
+    - Buckets partly inside the range are returned whole, their metrics cannot be split.
+    '''
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Invalid granularity '{granularity}', expected one of {GRANULARITIES}")
+    if by not in DIMENSIONS:
+        raise ValueError(f"Invalid dimension '{by}', expected one of {DIMENSIONS}")
+    table = rollups[(granularity, by)]
+    if name:
+        if name not in table.index.get_level_values('name'):
+            return []
+        table = table.loc[[name]]
+    # Flooring the start to its bucket keeps the bucket it falls in
+    start = get_buckets(pd.Series([start_date]), granularity).iloc[0] if start_date else None
+    # Normalized like the buckets, so a timezone aware end date can be compared with them
+    end = parse_dates(pd.Series([end_date])).iloc[0] if end_date else None
+    if start is pd.NaT:
+        raise ValueError(f"Invalid start date '{start_date}'")
+    if end is pd.NaT:
+        raise ValueError(f"Invalid end date '{end_date}'")
+    if start is not None or end is not None:
+        buckets = table.index.get_level_values('bucket')
+        mask = pd.Series(True, index=table.index)
+        if start is not None:
+            mask &= buckets >= start
+        if end is not None:
+            mask &= buckets <= end
+        table = table[mask.to_numpy()]
+    ret = table.reset_index()
+    ret['bucket'] = ret['bucket'].dt.strftime('%Y-%m-%d')
+    return ret.to_dict(orient='records')
@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import threading
+import numpy as np
+
+'''
+This module contains the pluggable sentiment backends used to annotate commit messages.
+
+Every backend maps a list of messages to one {'label', 'score'} dictionary per message, with the labels of FinBERT
+('positive', 'negative', 'neutral'). The deployment default is set with `EVNO_SENTIMENT_BACKEND` and requests may pick
+another backend by name. Transformer libraries are only imported by the backends that need them, so a replica running
+the lexicon backend never loads torch.
+'''
+
+#labels produced by every backend
+LABELS = ['positive', 'negative', 'neutral']
+#backend used when a request does not pick one
+DEFAULT_BACKEND = os.environ.get('EVNO_SENTIMENT_BACKEND', 'finbert')
+#local directory of the model loaded by the quantized backend (a saved HuggingFace sequence classification model)
+MODEL_PATH = os.environ.get('EVNO_SENTIMENT_MODEL_PATH')
+#optional JSON file of lexicon weights, {"bias": {label: w}, "weights": {token: {label: w}}}
+LEXICON_PATH = os.environ.get('EVNO_SENTIMENT_LEXICON')
+
+#default lexicon, tuned on commit messages
+POSITIVE_WORDS = ['add', 'adds', 'added', 'support', 'supports', 'improve', 'improves', 'improved', 'improvement',
+                  'enhance', 'enhancement', 'optimize', 'optimise', 'optimization', 'faster', 'speed', 'speedup',
+                  'feature', 'new', 'implement', 'implements', 'introduce', 'enable', 'better', 'simplify',
+                  'cleanup', 'refactor', 'upgrade', 'success', 'successfully', 'great', 'nice', 'awesome', 'release']
+NEGATIVE_WORDS = ['bug', 'bugs', 'crash', 'crashes', 'error', 'errors', 'fail', 'fails', 'failed', 'failing', 'failure',
+                  'broken', 'break', 'breaks', 'regression', 'revert', 'reverts', 'reverted', 'leak', 'leaks', 'wrong',
+                  'incorrect', 'issue', 'problem', 'panic', 'deadlock', 'race', 'hang', 'hangs', 'vulnerability',
+                  'exception', 'corrupt', 'corruption', 'bad', 'deprecated', 'remove', 'removed', 'hotfix', 'oops', 'workaround']
+#"fix" says something was broken, but a fix is not bad news on its own
+WEAK_NEGATIVE_WORDS = ['fix', 'fixes', 'fixed', 'fixing']
+
+
+class SentimentBackend:
+    '''
+    Base class of the sentiment backends. Subclasses implement `predict`.
+
+    Note:
+    - `inline` backends are cheap enough to run on the request thread instead of the worker pool.
+    '''
+    name = None
+    inline = False
+
+    def predict(self, commit_msgs):
+        '''
+        Classifies a batch of commit messages.
+
+        Parameters:
+        - commit_msgs (list): Commit messages.
+
+        Returns:
+        - list: One {'label', 'score'} dictionary per message.
+        '''
+        raise NotImplementedError
+
+    def __call__(self, commit_msgs):
+        return self.predict(list(commit_msgs))
+
+
+class LexiconBackend(SentimentBackend):
+    '''
+    Linear bag-of-words classifier: each label's logit is its bias plus the weights of the message's tokens,
+    and the score is the softmax probability of the winning label.
+
+    Parameters:
+    - path (str, optional): JSON file of weights, the built-in commit lexicon if omitted.
+    '''
+    name = 'lexicon'
+    inline = True
+
+    def __init__(self, path=LEXICON_PATH):
+        if path:
+            with open(path) as f:
+                spec = json.load(f)
+        else:
+            spec = self.default_weights()
+        self.bias = np.array([spec['bias'].get(label, 0.0) for label in LABELS])
+        self.weights = {token: np.array([weights.get(label, 0.0) for label in LABELS])
+                        for token, weights in spec['weights'].items()}
+
+    @staticmethod
+    def default_weights():
+        '''
+        Returns the weights of the built-in commit lexicon.
+        '''
+        weights = {}
+        for word in POSITIVE_WORDS:
+            weights[word] = {'positive': 1.0}
+        for word in NEGATIVE_WORDS:
+            weights[word] = {'negative': 1.0}
+        for word in WEAK_NEGATIVE_WORDS:
+            weights[word] = {'negative': 0.4}
+        return {'bias': {'neutral': 0.5}, 'weights': weights}
+
+    def predict(self, commit_msgs):
+        ret = []
+        for msg in commit_msgs:
+            logits = self.bias.copy()
+            # Only the subject line carries the intent of a commit
+            for token in re.findall(r'[a-z]+', str(msg).split('\n', 1)[0].lower()):
+                if token in self.weights:
+                    logits += self.weights[token]
+            probabilities = np.exp(logits - logits.max())
+            probabilities /= probabilities.sum()
+            i = int(probabilities.argmax())
+            ret.append({'label': LABELS[i], 'score': float(probabilities[i])})
+        return ret
+
+
+class TransformerBackend(SentimentBackend):
+    '''
+    Wraps a HuggingFace text classification pipeline, messages longer than the model's input are truncated.
+    '''
+    def __init__(self, classifier):
+        self.classifier = classifier
+
+    def predict(self, commit_msgs):
+        return [{'label': result['label'].lower(), 'score': float(result['score'])}
+                for result in self.classifier(commit_msgs, truncation=True)]
+
+
+class FinbertBackend(TransformerBackend):
+    '''
+    The full ProsusAI/finbert model.
+    '''
+    name = 'finbert'
+
+    def __init__(self, model='ProsusAI/finbert'):
+        from transformers import pipeline
+        super().__init__(pipeline(task='sentiment-analysis', model=model))
+
+
+class QuantizedBackend(TransformerBackend):
+    '''
+    A sequence classification model loaded from a local directory, with its linear layers dynamically quantized to int8.
+
+    Parameters:
+    - model_path (str): Directory of the saved model and tokenizer (e.g. FinBERT saved with `save_pretrained`).
+
+    Raises:
+    - ValueError: If no model path is configured.
+    '''
+    name = 'quantized'
+
+    def __init__(self, model_path=MODEL_PATH):
+        if not model_path:
+            raise ValueError("The quantized sentiment backend needs a local model, set EVNO_SENTIMENT_MODEL_PATH")
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
+        tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        model = AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True)
+        model = torch.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(pipeline(task='sentiment-analysis', model=model, tokenizer=tokenizer))
+
+
+#available backends by name
+BACKENDS = {
+    'lexicon': LexiconBackend,
+    'quantized': QuantizedBackend,
+    'finbert': FinbertBackend,
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+def check_backend(name):
+    '''
+    Validates a backend name, None stands for the deployment default.
+
+    Returns:
+    - str: The backend name.
+
+    Raises:
+    - ValueError: If there is no such backend.
+    '''
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Invalid sentiment backend '{name}', expected one of {list(BACKENDS.keys())}")
+    return name
+
+def get_backend(name=None):
+    '''
+    Returns a sentiment backend, loaded once per process.
+
+    Parameters:
+    - name (str, optional): Name of the backend, `DEFAULT_BACKEND` if omitted.
+
+    Returns:
+    - SentimentBackend: The loaded backend.
+
+    Raises:
+    - ValueError: If there is no such backend or it cannot be configured.
+    '''
+    name = check_backend(name)
+    with _lock:
+        if name not in _loaded:
+            _loaded[name] = BACKENDS[name]()
+        return _loaded[name]
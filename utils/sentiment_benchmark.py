@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import resource
+import multiprocessing
+from tabulate import tabulate
+import utils.sentiment as sentiment
+
+'''
+This module benchmarks the sentiment backends against each other.
+
+Each backend runs in a fresh process so its load time and peak memory are measured in isolation. The report gives
+the throughput and the agreement of each backend with a reference backend (finbert by default).
+
+Note:
+- There is no labelled ground truth, so the report has no accuracy column. The bundled messages were written alongside
+  the default lexicon and share its keywords, use `--repo` to compare the backends on the history of a real repository.
+
+Usage:
+```
+python -m utils.sentiment_benchmark --backends lexicon,quantized,finbert --repeat 20
+python -m utils.sentiment_benchmark --repo output-torvalds-linux --limit 2000
+```
+'''
+
+#commit messages shipped with the benchmark
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sentiment_sample.jsonl')
+
+
+def load_sample(path):
+    '''
+    Reads a sample of commit messages, one {"msg"} object per line.
+
+    Returns:
+    - list: The messages.
+    '''
+    msgs = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            msgs.append(json.loads(line)['msg'])
+    return msgs
+
+def load_repo_sample(path, limit=1000):
+    '''
+    Reads the latest commit subjects of a local git repository.
+
+    Parameters:
+    - path (str): Path of the repository (a clone made by /clone works, bare or not).
+    - limit (int): Maximum number of messages.
+
+    Returns:
+    - list: The messages.
+    '''
+    result = subprocess.run(['git', '-C', path, 'log', f'--max-count={limit}', '--format=%s'],
+                            capture_output=True, text=True, check=True)
+    return [line for line in result.stdout.splitlines() if line.strip()]
+
+def _peak_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def measure(name, msgs, repeat, batch_size):
+    '''
+    Loads a backend and times it over the sample, run in its own process.
+
+    Parameters:
+    - name (str): Name of the backend.
+    - msgs (list): Sample messages.
+    - repeat (int): Number of passes over the sample.
+    - batch_size (int): Number of messages per call.
+
+    Returns:
+    - dict: Predicted labels, load time, throughput and memory, or the error that prevented running the backend.
+    '''
+    base_mb = _peak_mb()
+    try:
+        start = time.perf_counter()
+        backend = sentiment.get_backend(name)
+        load_seconds = time.perf_counter() - start
+        predictions = [result['label'] for result in backend(msgs)]
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for i in range(0, len(msgs), batch_size):
+                backend(msgs[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        # A backend missing its model or libraries is reported, not fatal
+        return {'backend': name, 'error': f"{type(e).__name__}: {e}"}
+    return {
+        'backend': name,
+        'predictions': predictions,
+        'load s': round(load_seconds, 2),
+        'msgs/s': round(repeat * len(msgs) / elapsed, 1),
+        'peak MB': round(_peak_mb() - base_mb, 1),
+    }
+
+def run_benchmark(backends, msgs, reference='finbert', repeat=10, batch_size=32):
+    '''
+    Benchmarks backends over a sample of commit messages.
+
+    Parameters:
+    - backends (list): Names of the backends.
+    - msgs (list): Sample messages.
+    - reference (str, optional): Backend the others are compared to, run even if it is not in `backends`.
+    - repeat (int): Number of timed passes over the sample.
+    - batch_size (int): Number of messages per call.
+
+    Returns:
+    - list of dict: One row per backend.
+    '''
+    if reference and reference not in backends:
+        backends = list(backends) + [reference]
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for name in backends:
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(measure, (name, msgs, repeat, batch_size))
+
+    reference_predictions = results.get(reference, {}).get('predictions')
+    rows = []
+    for name, result in results.items():
+        if 'error' in result:
+            rows.append({'backend': name, 'error': result['error']})
+            continue
+        predictions = result.pop('predictions')
+        if reference_predictions is not None:
+            agreement = sum(p == r for p, r in zip(predictions, reference_predictions)) / len(msgs)
+            result[f'agreement with {reference} %'] = round(100 * agreement, 1)
+        rows.append(result)
+    return rows
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compares the throughput, memory and agreement of the sentiment backends.")
+    parser.add_argument('--backends', default=','.join(sentiment.BACKENDS.keys()), help="comma separated backends to run")
+    parser.add_argument('--reference', default='finbert', help="backend the others are compared to")
+    parser.add_argument('--sample', default=SAMPLE_PATH, help="JSON lines sample of commit messages")
+    parser.add_argument('--repo', help="use the latest commit subjects of this local git repository instead of the sample")
+    parser.add_argument('--limit', type=int, default=1000, help="number of commit subjects read with --repo")
+    parser.add_argument('--repeat', type=int, default=10, help="timed passes over the sample")
+    parser.add_argument('--batch-size', type=int, default=32, help="messages per call")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    msgs = load_repo_sample(args.repo, args.limit) if args.repo else load_sample(args.sample)
+    rows = run_benchmark(args.backends.split(','), msgs, args.reference, args.repeat, args.batch_size)
+    if args.json:
+        print(json.dumps(rows))
+    else:
+        print(tabulate(rows, headers='keys', tablefmt='fancy_grid'))
@@ -1,37 +1,26 @@
-from transformers import pipeline
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans  
+from sklearn.cluster import MiniBatchKMeans
+import utils.metrics as metrics
+import utils.sentiment as sentiment
 
 
 #Sentiment analysis
-def init_pipeline(task = 'sentiment-analysis', model = None):
+def sentiment_analysis(commit_msgs, backend=None):
     '''
-    Initializes a HuggingFace Transformers pipeline for a specific NLP task.
-
-    Parameters:
-    - task (str): The NLP task to perform (default: 'sentiment-analysis').
-    - model (str): Optional parameter specifying the pre-trained model to use.
-
-    Returns:
-    - transformers.Pipeline: A Hugging Face Transformers pipeline.
-    '''
-    if model:
-        return pipeline(task=task, model=model)
-    return pipeline(task=task)
-
-def sentiment_analysis(commit_msgs):
-    '''
-    Performs sentiment analysis on commit messages using a pre-trained model.
+    Performs sentiment analysis on commit messages.
 
     Parameters:
     - commit_msgs (list): List of commit messages to analyze.
+    - backend (str, optional): Name of the sentiment backend (see `utils.sentiment.BACKENDS`), the deployment default if omitted.
 
     Returns:
     - list: List of dictionaries containing sentiment analysis results for each commit message.
+
+    Note:
+    - Backends are loaded once per process and reused by later calls.
     '''
-    model = init_pipeline('sentiment-analysis', model='ProsusAI/finbert')
-    return model(commit_msgs)
+    return sentiment.get_backend(backend)(commit_msgs)
 
 #end of sentiment analysis
 
@@ -52,159 +41,199 @@ def get_num_days_between_dates(date1, date2):
 
     return num_days
 
-def get_repo_time(df):
+#Incremental developer aggregates
+#per author commit counters, in feature matrix order
+COMMIT_AGGREGATES = ['num_commits', 'num_files_changed', 'num_lines_added', 'num_lines_deleted', 'num_lines_changed']
+#issue labels counted per author
+ISSUE_LABELS = ['bug', 'documentation', 'duplicate', 'enhancement', 'future']
+#per author issue counters, in feature matrix order
+ISSUE_AGGREGATES = ['num_issues', 'num_opened', 'num_closed'] + ISSUE_LABELS
+#feature matrix columns, in order
+FEATURES = ['num_commits', 'commit_frequency'] + COMMIT_AGGREGATES[1:] + ISSUE_AGGREGATES
+
+class DeveloperAggregates:
     '''
-    Calculates the number of days between the latest and oldest dates in a DataFrame.
-
-    Parameters:
-    - df (pd.DataFrame): DataFrame containing commit history with a 'date' column.
-
-    Returns:
-    - int: The number of days between the latest and oldest dates.
-    '''
-    # Ensure the 'date' column is in datetime format
-    df_copy = df.copy()
-    df_copy['date'] = pd.to_datetime(df_copy['date'])
-
-
-    # Find the latest and oldest dates in the 'date' column
-    latest_date = df_copy['date'].max()
-    oldest_date = df_copy['date'].min()
-
-    # Calculate the number of days between the latest and oldest dates
-    num_days = get_num_days_between_dates(latest_date, oldest_date)
-
-    return num_days
-
-def extract_features_commits_df(df):
-    '''
-    Extracts features from commit history in a DataFrame.
-
-    Parameters:
-    - df (pd.DataFrame): DataFrame containing commit history with relevant columns.
-
-    Returns:
-    - pd.DataFrame: DataFrame with features extracted for each author.
+    Running per author aggregates of a repository, maintained as commits and issues arrive.
 
     Note:
-    - Extracts features such as the number of commits, commit frequency, number of files changed, 
-      number of lines added, number of lines deleted, and number of lines changed for each author.
-    - Calculates commit frequency as the number of commits divided by the repository duration.
-    - Returns a DataFrame with aggregated features for each author.
+    - Commit counters are summed per batch of new commits, so adding commits costs O(new commits).
+    - Issues are keyed by number; an issue seen again replaces its previous contribution, so re-fetched or
+      edited issues are not counted twice, and deleted or transferred issues can be removed.
+    - `features` returns the feature matrix used for clustering without touching the commit history.
     '''
-    authors = {}
-    for _, row in df.iterrows():
-        curr_commit = {}
-        curr_commit['date'] = row['date']
-        curr_commit['files'] = len(row['files'])
-        curr_commit['#added'] = row['#added']
-        curr_commit['#deleted'] = row['#deleted']
-        curr_commit['#lines changed'] = row['#lines changed']
-        name = row['author']
-        if name in authors.keys():
-            authors[name]['name'] = name
-            authors[name]['num_commits'] += 1
-            authors[name]['num_files_changed'] += curr_commit['files']
-            authors[name]['num_lines_added'] += curr_commit['#added']
-            authors[name]['num_lines_deleted'] += curr_commit['#deleted']
-            authors[name]['num_lines_changed'] += curr_commit['#lines changed']
+    def __init__(self):
+        self.commits = pd.DataFrame(columns=COMMIT_AGGREGATES + ['first_commit', 'last_commit'])
+        self.issue_counts = pd.DataFrame(columns=ISSUE_AGGREGATES)
+        self.issues = {}
+        self.first_date = None
+        self.last_date = None
+        self.issues_updated_at = None
+
+    def add_commits(self, df):
+        '''
+        Adds a batch of new commits to the aggregates.
+
+        Parameters:
+        - df (pd.DataFrame): DataFrame containing only the new commits.
+        '''
+        if len(df) == 0:
+            return
+        dates = pd.to_datetime(df['date'], utc=True, errors='coerce')
+        batch = pd.DataFrame({
+            'name': df['author'].to_numpy(),
+            'num_commits': 1,
+            'num_files_changed': df['files'].map(len).to_numpy(),
+            'num_lines_added': df['#added'].to_numpy(),
+            'num_lines_deleted': df['#deleted'].to_numpy(),
+            'num_lines_changed': df['#lines changed'].to_numpy(),
+            'date': dates.to_numpy(),
+        })
+        grouped = batch.groupby('name')
+        delta = grouped[COMMIT_AGGREGATES].sum()
+        first = grouped['date'].min()
+        last = grouped['date'].max()
+        if len(self.commits) == 0:
+            commits = delta
+            commits['first_commit'] = first
+            commits['last_commit'] = last
         else:
-            authors[name] = {'name': name,
-                             'num_commits':1, 
-                             'commit_frequency':0, 
-                             'num_files_changed':curr_commit['files'], 
-                             'num_lines_added':curr_commit['#added'], 
-                             'num_lines_deleted':curr_commit['#deleted'], 
-                             'num_lines_changed':curr_commit['#lines changed'], 
-                             }
-    for name in authors.keys():
-        authors[name]['commit_frequency'] = authors[name]['num_commits'] / get_repo_time(df)
-    df_parse = pd.DataFrame(authors).T
-    return df_parse
-
-def extract_features_issues_response(response_json):
-    authors = {}
-    for issue in response_json:
-      name = issue['user']['login']
-      if name in authors.keys():
-        authors[name]['num_issues'] += 1
-        authors[name]['num_opened'] += 1 if issue['state'] == 'opened' else 0
-        authors[name]['num_closed'] += 1 if issue['state'] == 'opened' else 0
-        for label in issue['labels']:
-          authors[name][label] += 1
-      else:
-        authors[name] = {'name': name,
-                         'num_issues':1,
-                         'num_opened' : 1 if issue['state'] == 'opened' else 0,
-                         'num_closed' : 1 if issue['state'] == 'closed' else 0,
-                         'bug': 0,
-                         'documentation': 0,
-                         'duplicate': 0,
-                         'enhancement': 0,
-                         'future': 0
-        } 
-      df = pd.DataFrame(authors).T
-      return df
-
-def cluster_developers(df, num_clusters=3):
+            commits = self.commits[COMMIT_AGGREGATES].add(delta, fill_value=0)
+            commits['first_commit'] = pd.concat([self.commits['first_commit'], first], axis=1).min(axis=1)
+            commits['last_commit'] = pd.concat([self.commits['last_commit'], last], axis=1).max(axis=1)
+        self.commits = commits
+        self.first_date = dates.min() if self.first_date is None else min(self.first_date, dates.min())
+        self.last_date = dates.max() if self.last_date is None else max(self.last_date, dates.max())
+
+    def _issue_contribution(self, name, state, labels):
+        contribution = dict.fromkeys(ISSUE_AGGREGATES, 0)
+        contribution['num_issues'] = 1
+        contribution['num_opened'] = 1 if state == 'open' else 0
+        contribution['num_closed'] = 1 if state == 'closed' else 0
+        for label in labels:
+            if label in ISSUE_LABELS:
+                contribution[label] += 1
+        return name, contribution
+
+    def upsert_issues(self, issues):
+        '''
+        Adds new issues, or updates the state and labels of known ones, in the aggregates.
+
+        Parameters:
+        - issues (list): List of dictionaries representing issues from the GitHub API (or webhook payloads).
+        '''
+        delta = {}
+        for issue in issues:
+            labels = [label['name'] if isinstance(label, dict) else label for label in issue.get('labels', [])]
+            name, contribution = self._issue_contribution(issue['user']['login'], issue.get('state'), labels)
+            previous = self.issues.get(issue['number'])
+            if previous is not None:
+                old_name, old_contribution = previous
+                old = delta.setdefault(old_name, dict.fromkeys(ISSUE_AGGREGATES, 0))
+                for key, value in old_contribution.items():
+                    old[key] -= value
+            new = delta.setdefault(name, dict.fromkeys(ISSUE_AGGREGATES, 0))
+            for key, value in contribution.items():
+                new[key] += value
+            self.issues[issue['number']] = (name, contribution)
+            updated_at = issue.get('updated_at')
+            if updated_at and (self.issues_updated_at is None or updated_at > self.issues_updated_at):
+                self.issues_updated_at = updated_at
+        self._apply_issue_delta(delta)
+
+    def remove_issues(self, numbers):
+        '''
+        Removes the contribution of deleted or transferred issues from the aggregates.
+
+        Parameters:
+        - numbers (list): Numbers of the issues, unknown numbers are ignored.
+        '''
+        delta = {}
+        for number in numbers:
+            previous = self.issues.pop(number, None)
+            if previous is None:
+                continue
+            name, contribution = previous
+            old = delta.setdefault(name, dict.fromkeys(ISSUE_AGGREGATES, 0))
+            for key, value in contribution.items():
+                old[key] -= value
+        self._apply_issue_delta(delta)
+
+    def _apply_issue_delta(self, delta):
+        if not delta:
+            return
+        delta = pd.DataFrame(delta).T[ISSUE_AGGREGATES]
+        issue_counts = self.issue_counts.add(delta, fill_value=0) if len(self.issue_counts) else delta
+        # Authors left without issues are dropped, so they do not show up as developers without any activity
+        self.issue_counts = issue_counts[issue_counts['num_issues'] > 0]
+
+    def repo_days(self):
+        '''
+        Returns the number of days between the oldest and newest commit (at least 1).
+        '''
+        if self.first_date is None:
+            return 1
+        return max(get_num_days_between_dates(self.last_date, self.first_date), 1)
+
+    def features(self):
+        '''
+        Returns the per author feature matrix used for clustering.
+
+        Returns:
+        - pd.DataFrame: DataFrame with a 'name' column followed by the `FEATURES` columns.
+        '''
+        features = self.commits[COMMIT_AGGREGATES].join(self.issue_counts, how='outer')
+        features = features.reindex(columns=COMMIT_AGGREGATES + ISSUE_AGGREGATES).fillna(0)
+        features['commit_frequency'] = features['num_commits'] / self.repo_days()
+        features.index.name = 'name'
+        return features[FEATURES].reset_index()
+
+def cluster_features(features, num_clusters, model=None):
     '''
-    Extracts features from GitHub issues API response.
+    Clusters developers from a ready-made feature matrix with MiniBatchKMeans.
 
     Parameters:
-    - response_json (list): List of dictionaries representing issues from the GitHub API.
+    - features (pd.DataFrame): Feature matrix as returned by `DeveloperAggregates.features`.
+    - num_clusters (int): Number of clusters.
+    - model (MiniBatchKMeans, optional): Model of a previous call, warm-started with `partial_fit` when compatible.
 
     Returns:
-    - pd.DataFrame: DataFrame with features extracted for each author from issues.
-
-    Note:
-    - Extracts features such as the number of issues, number of opened issues, number of closed issues,
-      and counts of different label types (e.g., bug, documentation, enhancement) for each author.
-    - Returns a DataFrame with aggregated features for each author from GitHub issues.
-
+    - tuple: (DataFrame with 'name' and 'cluster' columns, fitted model).
     '''
-    #take care of nan values
-    df = df.fillna(0)
-    X = df.drop(columns=['name']).to_numpy()
-    # Apply k-means clustering
-    kmeans = KMeans(n_clusters=num_clusters, random_state=0).fit(X)
-    df['cluster'] = kmeans.labels_
-
-    # Create a new DataFrame with 'name:cluster' format
-    result_df = df[['name', 'cluster']]
-
-    return result_df
-
-def kmeans(commits_df, num_clusters=2, response_json_issues = None):
+    X = features.drop(columns=['name']).to_numpy(dtype=float)
+    if model is not None and model.n_clusters == num_clusters and model.n_features_in_ == X.shape[1]:
+        # Continue from the previous centroids
+        model.partial_fit(X)
+    else:
+        model = MiniBatchKMeans(n_clusters=num_clusters, random_state=0, n_init=3).fit(X)
+    result_df = features[['name']].copy()
+    result_df['cluster'] = model.predict(X)
+    return result_df, model
+
+def kmeans_from_aggregates(aggregates, num_clusters=2, model=None, cluster=cluster_features):
     '''
-    Performs K-means clustering on developers based on their commit history.
+    Performs K-means clustering on developers from their running aggregates.
 
     Parameters:
-    - commits_df (pd.DataFrame): DataFrame containing commit history with relevant columns.
+    - aggregates (DeveloperAggregates): Aggregates of the repository.
     - num_clusters (int): Number of clusters for K-means. Defaults to 2.
-    - response_json_issues (list): List of dictionaries representing issues from the GitHub API.
+    - model (MiniBatchKMeans, optional): Model of a previous call on the same repository.
+    - cluster (callable, optional): Function fitting the clusters with the signature of `cluster_features`,
+      used to run the fit in a worker process.
 
     Returns:
-    - pd.DataFrame: DataFrame with developer names and their corresponding cluster assignments.
-
-    Note:
-    - Extracts features from commit history using `extract_features_commits_df` function.
-    - Optionally incorporates features from issues using `extract_features_issues_response`.
-    - Performs K-means clustering on the combined feature set.
-    - Returns a DataFrame with developer names and their corresponding cluster assignments.
+    - tuple: (DataFrame with developer names and their cluster assignments or None on error, fitted model).
     '''
-    try: 
+    try:
         num_clusters = int(num_clusters)
     except ValueError:
         print("Error: Invalid number of clusters")
-        return None
-    df_commits = extract_features_commits_df(commits_df)
-    if response_json_issues:
-        df_issues = extract_features_issues_response(response_json_issues)
-        df_commits = pd.merge(df_commits, df_issues, how='outer', on='name')
-        
-    if len(df_commits) < num_clusters:
+        return None, model
+    with metrics.stage_timer('features'):
+        features = aggregates.features()
+    if len(features) < num_clusters:
         print("Error: Number of clusters is greater than the number of developers")
-        return None
-    #make the name column the index
-    return cluster_developers(df_commits, num_clusters)
+        return None, model
+    # Timed here rather than in `cluster_features`, which may run in a worker process with its own metrics
+    with metrics.stage_timer('kmeans_fit'):
+        return cluster(features, num_clusters, model)
 #end of developer clustering
\ No newline at end of file
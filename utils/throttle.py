@@ -0,0 +1,45 @@
+import threading
+import time
+
+'''
+This module contains the rate limiting helpers shared by the server's GitHub calls.
+'''
+
+
+class TokenBucket:
+    '''
+    Thread safe token bucket rate limiter.
+
+    Parameters:
+    - rate (float): Tokens added per second, 0 or None disables the limiter.
+    - capacity (float, optional): Maximum burst size, defaults to one second worth of tokens.
+
+    Example:
+    ```
+    bucket = TokenBucket(rate=10)
+    bucket.acquire()  # blocks until a token is available
+    ```
+    '''
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate or 0)
+        self.capacity = float(capacity or max(self.rate, 1))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        '''
+        Blocks until `tokens` tokens are available and consumes them.
+        '''
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
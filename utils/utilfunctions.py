@@ -5,6 +5,11 @@ from tabulate import tabulate
 import re
 from datetime import datetime
 import io
+import os
+import subprocess
+import utils.query as query
+import hmac
+import hashlib
 
 '''
 This module contains utility functions used by the server and client.
@@ -39,6 +44,39 @@ def validate_date_format(date):
     except ValueError:
         return False
 
+#characters allowed in GitHub user, organization and repository names
+GITHUB_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+def validate_github_name(name):
+    '''
+    Validates a GitHub user, organization or repository name.
+
+    Parameters:
+    - name (str): Name to be validated.
+
+    Returns:
+    - bool: True if the name is valid, False otherwise.
+
+    Note:
+    - Names are used as path components on the server, so '.' and '..' are rejected as well.
+    '''
+    return isinstance(name, str) and bool(GITHUB_NAME_PATTERN.match(name)) and name not in ('.', '..')
+
+def is_inside_dir(path, root):
+    '''
+    Checks whether a path lies strictly inside a directory, once symlinks and '..' are resolved.
+
+    Parameters:
+    - path (str): Path to check.
+    - root (str): Directory `path` must be inside of.
+
+    Returns:
+    - bool: True if `path` is below `root`, False if it is `root` itself or outside of it.
+    '''
+    path = os.path.realpath(path)
+    root = os.path.realpath(root)
+    return path != root and os.path.commonpath([path, root]) == root
+
 def format_date(input_date):
     '''
     Formats a date string into "dd-mm-yyyy" format.
@@ -75,49 +113,6 @@ def format_date(input_date):
         return None
     
 
-def filter_dataframe_by_date(start_date, end_date):
-    '''
-    Returns a filter query to filter a DataFrame by a date range.
-
-    Parameters:
-    - start_date (str): Start date of the desired date range (format: "yyyy-mm-dd").
-    - end_date (str): End date of the desired date range (format: "yyyy-mm-dd").
-
-    Returns:
-    - str or None: Filter query string if successful, None if an error occurs.
-
-    Note:
-    - Parses start and end dates using the `format_date` function.
-    - Converts the parsed dates to datetime objects.
-    - Creates a filter query string based on the date range.
-    - Returns the filter query if successful, otherwise returns None.
-    '''
-    # Parse start and end dates using the format_date function
-    start_date = format_date(start_date)
-    end_date = format_date(end_date)
-    
-    try:
-        # Convert the start and end dates to datetime objects
-        start_date = pd.to_datetime(start_date) if start_date else None
-        end_date = pd.to_datetime(end_date) if end_date else None
-        date_query = ""
-        # Filter the df based on the date range
-        if start_date and end_date:
-            date_query = f"date >= '{start_date}' & date <= '{end_date}'"
-        elif start_date:
-           date_query = f"date >= '{start_date}'"
-        elif end_date:
-            date_query = f"date <= '{end_date}'"
-        else:
-            # If both dates are None, then empy query
-            return ""
-
-        return date_query
-    except ValueError:
-        # Handle invalid date formats
-        print("Error: Invalid date format in DataFrame")
-        return None
-
 def extract_key(json_data):
     '''
     Parameters:
@@ -160,22 +155,15 @@ def parse_json(json_string):
         return data
     return None
 
-def parse_commits(response_json):
+def parse_commit_record(response_json):
     '''
-    Parses commit data from a GitHub API response and returns a fitting pandas DataFrame.
+    Parses commit data from a GitHub API response into a flat dictionary.
 
     Parameters:
     - response_json (dict): JSON data representing a commit from a GitHub API response.
 
     Returns:
-    - pd.DataFrame: DataFrame containing parsed commit information.
-
-    Note:
-    - Extracts relevant information from the commit JSON data.
-    - Creates a DataFrame containing columns for SHA, author, committer, date, message, files, and basic statistics.
-    - The date is formatted using the `format_date` function.
-    - Returns the parsed DataFrame.
-
+    - dict: Commit record with SHA, author, committer, date, message, files, and basic statistics.
     '''
     commit = response_json
     curr_commit = {}
@@ -189,51 +177,129 @@ def parse_commits(response_json):
     curr_commit['#added'] = commit['stats']['additions']
     curr_commit['#deleted'] = commit['stats']['deletions']
     curr_commit['#lines changed'] = commit['stats']['total']
-    commit_data = [curr_commit]
+    return curr_commit
 
-    df_parse = pd.DataFrame(commit_data)
-    print("Finished parsing commit history")
-    return df_parse
-    
-def search_commit(df, sha=None, author=None, date=None, msg=None, commiter=None):
+def parse_push_commit(commit):
     '''
-    Searches commit(s) in a DataFrame based on given criteria.
+    Parses a commit of a GitHub `push` webhook payload into a commit record.
+
+    Parameters:
+    - commit (dict): Commit entry of the payload's 'commits' list.
+
+    Returns:
+    - dict: Commit record with the same keys as `parse_commit_record`.
+
+    Note:
+    - Push payloads carry no line statistics, so '#added', '#deleted' and '#lines changed' are 0.
+      The record is only used when the commit details cannot be fetched from the GitHub API.
+    '''
+    files = commit.get('added', []) + commit.get('removed', []) + commit.get('modified', [])
+    curr_commit = {}
+    curr_commit['sha'] = commit['id']
+    curr_commit['author'] = commit['author']['name']
+    curr_commit['committer'] = commit['committer']['name']
+    # Normalize to UTC so dates compare like the ones returned by the REST API
+    curr_commit['date'] = pd.to_datetime(commit['timestamp'], utc=True).strftime('%Y-%m-%dT%H:%M:%SZ')
+    curr_commit['msg'] = commit['message']
+    curr_commit['files'] = files
+    curr_commit['#changed'] = len(files)
+    curr_commit['#added'] = 0
+    curr_commit['#deleted'] = 0
+    curr_commit['#lines changed'] = 0
+    return curr_commit
+
+def verify_signature(secret, body, signature):
+    '''
+    Verifies the `X-Hub-Signature-256` header of a GitHub webhook delivery.
+
+    Parameters:
+    - secret (str): Webhook secret shared with GitHub.
+    - body (bytes): Raw request body.
+    - signature (str): Value of the signature header ('sha256=<hex digest>').
+
+    Returns:
+    - bool: True if the signature matches the body, False otherwise.
+    '''
+    if not secret or not signature:
+        return False
+    expected = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def build_commit_query(sha=None, author=None, date=None, msg=None, commiter=None, path=None, path_prefix=None, path_glob=None):
+    '''
+    Builds a query filter from the classic search keys.
 
     Parameters:
-    - df (pd.DataFrame): DataFrame containing commit history.
     - sha (str): SHA of the commit to search for.
-    - author (str): Author name of the commit(s) to search for.
+    - author (str or list): Author name(s) of the commit(s) to search for.
     - date (tuple): Tuple representing the date range (start_date, end_date) to filter commits.
     - msg (str): Substring of the commit message to search for.
-    - commiter (str): Committer name of the commit(s) to search for.
+    - commiter (str or list): Committer name(s) of the commit(s) to search for.
+    - path (str or list): Path(s) of a file touched by the commit(s).
+    - path_prefix (str): Directory containing a file touched by the commit(s).
+    - path_glob (str): Shell-style pattern matching a file touched by the commit(s).
 
     Returns:
-    - list of dict: List of dictionaries representing the matching commit(s) if successful.
+    - query.Filter: AND of all the given keys.
     '''
-    if not (sha or author or date or msg or commiter):
-        return df.to_dict(orient='records')
-
     conditions = []
 
     if sha:
-        conditions.append(f"sha == '{sha}'")
-    
+        conditions.append(query.Eq('sha', sha))
+
     if author:
-        conditions.append(f"author == '{author}'")
-    
+        conditions.append(query.In('author', author if isinstance(author, list) else [author]))
+
     if date:
         (start_date, end_date) = date
-        conditions.append(filter_dataframe_by_date(start_date, end_date))
-    
+        start_date = None if start_date in (None, 'None') else start_date
+        end_date = None if end_date in (None, 'None') else end_date
+        conditions.append(query.DateRange(start_date, end_date))
+
     if msg:
-        conditions.append(f"msg.str.contains('{msg}')")
-    
+        conditions.append(query.Contains('msg', msg))
+
     if commiter:
-        conditions.append(f"committer == '{commiter}'")
+        conditions.append(query.In('committer', commiter if isinstance(commiter, list) else [commiter]))
 
-    query_str = " and ".join(conditions)
-    
-    return df.query(query_str).to_dict(orient='records')
+    if path:
+        conditions.append(query.PathIn('files', path if isinstance(path, list) else [path]))
+
+    if path_prefix:
+        conditions.append(query.PathPrefix('files', path_prefix))
+
+    if path_glob:
+        conditions.append(query.PathGlob('files', path_glob))
+
+    return query.And(*conditions)
+
+def search_commit(df, sha=None, author=None, date=None, msg=None, commiter=None, index=None, path=None, path_prefix=None, path_glob=None):
+    '''
+    Searches commit(s) in a DataFrame based on given criteria.
+
+    Parameters:
+    - df (pd.DataFrame): DataFrame containing commit history.
+    - sha (str): SHA of the commit to search for.
+    - author (str or list): Author name(s) of the commit(s) to search for.
+    - date (tuple): Tuple representing the date range (start_date, end_date) to filter commits.
+    - msg (str): Substring of the commit message to search for.
+    - commiter (str or list): Committer name(s) of the commit(s) to search for.
+    - index (query.CommitIndex, optional): Prebuilt index over `df`, built on the fly if omitted.
+    - path, path_prefix, path_glob (str, optional): Path filters, see `build_commit_query`.
+
+    Returns:
+    - list of dict: List of dictionaries representing the matching commit(s) if successful.
+
+    Note:
+    - Filters are evaluated as boolean masks by `utils.query`, so user input is never parsed as an expression.
+    '''
+    if not (sha or author or date or msg or commiter or path or path_prefix or path_glob):
+        return df.to_dict(orient='records')
+
+    if index is None:
+        index = query.CommitIndex(df)
+    commit_query = build_commit_query(sha, author, date, msg, commiter, path, path_prefix, path_glob)
+    return query.run_query(index, commit_query).to_dict(orient='records')
 
 def print_table(data):
     '''
@@ -265,4 +331,159 @@ def check_response(response, repo_name):
         return f"Error: '{response.json()['message']}'"
     else:
         return None
-    
\ No newline at end of file
+    
+#git clone options, 'auto' picks the cheapest clone the server's ingest can work with
+CLONE_OPTIONS = ['full', 'bare', 'blobless', 'shallow', 'single-branch']
+#ingest reads commits through the GitHub API only, so no working tree or file contents are needed
+AUTO_CLONE_OPTIONS = ['bare', 'blobless', 'single-branch']
+
+def parse_clone_mode(mode):
+    '''
+    Parses a comma separated clone mode (e.g. "blobless,single-branch") into a list of clone options.
+
+    Parameters:
+    - mode (str): Clone mode, 'auto' or None for the cheapest mode supporting ingest.
+
+    Returns:
+    - list: List of clone options.
+
+    Raises:
+    - ValueError: If an unknown option is given.
+    '''
+    if not mode or mode == 'auto':
+        return list(AUTO_CLONE_OPTIONS)
+    options = [option.strip() for option in mode.split(',') if option.strip()]
+    for option in options:
+        if option not in CLONE_OPTIONS:
+            raise ValueError(f"Invalid clone option '{option}', expected one of {CLONE_OPTIONS + ['auto']}")
+    if 'full' in options:
+        return []
+    return options
+
+def validate_branch_name(branch):
+    '''
+    Validates a git branch name.
+
+    Parameters:
+    - branch (str): Branch name to be validated.
+
+    Returns:
+    - bool: True if `branch` is a valid branch name, False otherwise.
+
+    Note:
+    - Names starting with '-' are rejected first, since git would read them as options.
+    '''
+    if not isinstance(branch, str) or not branch or branch.startswith('-'):
+        return False
+    result = subprocess.run(['git', 'check-ref-format', '--branch', branch], capture_output=True, text=True)
+    return result.returncode == 0
+
+def build_clone_cmd(repo_url, dest_path, options, since=None, branch=None):
+    '''
+    Builds the git command cloning a repository with the given clone options.
+
+    Parameters:
+    - repo_url (str): URL of the repository.
+    - dest_path (str): Destination path for the cloned repository.
+    - options (list): Clone options as returned by `parse_clone_mode`.
+    - since (str, optional): With 'shallow', only fetch history after this date (yyyy-mm-dd), otherwise the last commit only.
+    - branch (str, optional): Branch to clone, the remote's default branch if omitted.
+
+    Returns:
+    - list: The git command.
+    '''
+    cmd = ['git', 'clone']
+    if 'bare' in options:
+        cmd.append('--bare')
+    if 'blobless' in options:
+        cmd.append('--filter=blob:none')
+    if 'shallow' in options:
+        cmd.append(f'--shallow-since={since}' if since else '--depth=1')
+    if 'single-branch' in options:
+        cmd.append('--single-branch')
+    if branch:
+        cmd.extend(['--branch', branch])
+    cmd.extend([repo_url, dest_path])
+    return cmd
+
+def is_git_repo(path):
+    '''
+    Checks whether a path holds an existing git repository (bare or not).
+
+    Parameters:
+    - path (str): Path to check.
+
+    Returns:
+    - bool: True if `path` is a git repository, False otherwise.
+    '''
+    if not os.path.isdir(path):
+        return False
+    result = subprocess.run(['git', '-C', path, 'rev-parse', '--absolute-git-dir'], capture_output=True, text=True)
+    if result.returncode != 0:
+        return False
+    # rev-parse walks up the tree, make sure `path` itself is the repository and not a folder inside another one
+    git_dir = os.path.realpath(result.stdout.strip())
+    path = os.path.realpath(path)
+    return git_dir in (path, os.path.join(path, '.git'))
+
+def get_origin_url(path):
+    '''
+    Returns the URL of the 'origin' remote of a git repository.
+
+    Parameters:
+    - path (str): Path of the repository.
+
+    Returns:
+    - str or None: The URL of 'origin', None if the repository has no such remote.
+    '''
+    result = subprocess.run(['git', '-C', path, 'remote', 'get-url', 'origin'], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+def same_repo_url(url1, url2):
+    '''
+    Checks whether two GitHub repository URLs point to the same repository.
+
+    Note:
+    - GitHub names are case insensitive and the '.git' suffix and a trailing '/' are optional.
+    '''
+    def normalize(url):
+        url = url.strip().rstrip('/').lower()
+        return url[:-len('.git')] if url.endswith('.git') else url
+    return normalize(url1) == normalize(url2)
+
+def build_fetch_cmd(dest_path, options, since=None, branch=None):
+    '''
+    Builds the git command updating an existing clone in place.
+
+    Parameters:
+    - dest_path (str): Path of the existing clone.
+    - options (list): Clone options as returned by `parse_clone_mode`.
+    - since (str, optional): With 'shallow', only fetch history after this date (yyyy-mm-dd).
+    - branch (str, optional): Branch to fetch.
+
+    Returns:
+    - list: The git command.
+
+    Note:
+    - Bare clones have no remote tracking refspec, so their branches are fetched onto the local heads.
+
+    Raises:
+    - ValueError: If `branch` is not a valid branch name.
+    '''
+    if branch and not validate_branch_name(branch):
+        raise ValueError(f"Invalid branch name '{branch}'")
+    cmd = ['git', '-C', dest_path, 'fetch', '--prune']
+    if 'blobless' in options:
+        cmd.append('--filter=blob:none')
+    if 'shallow' in options and since:
+        cmd.append(f'--shallow-since={since}')
+    cmd.append('origin')
+    bare = subprocess.run(['git', '-C', dest_path, 'rev-parse', '--is-bare-repository'], capture_output=True, text=True)
+    if bare.stdout.strip() == 'true':
+        ref = branch if branch else '*'
+        cmd.append(f'+refs/heads/{ref}:refs/heads/{ref}')
+    elif branch:
+        cmd.append(branch)
+    return cmd
@@ -0,0 +1,144 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import utils.statsitcs as statistics
+import utils.sentiment as sentiment
+
+'''
+This module contains the process pool running the server's CPU heavy tasks (sentiment inference and clustering)
+away from the request threads.
+
+The pool admits a bounded number of tasks (running and queued); when it is full new tasks are rejected
+immediately with `PoolSaturated`, and a task not done within its timeout raises `PoolTimeout`.
+'''
+
+#number of worker processes
+POOL_WORKERS = int(os.environ.get('EVNO_POOL_WORKERS', 2))
+#maximum number of tasks running or waiting in the pool
+POOL_QUEUE_SIZE = int(os.environ.get('EVNO_POOL_QUEUE_SIZE', 8))
+#seconds a request waits for its task
+POOL_TIMEOUT = float(os.environ.get('EVNO_POOL_TIMEOUT', 60))
+
+
+class PoolSaturated(Exception):
+    '''
+    Raised when the pool already holds its maximum number of tasks.
+    '''
+
+
+class PoolTimeout(Exception):
+    '''
+    Raised when a task is not done within its timeout, or the pool is broken.
+    '''
+
+
+def _init_worker():
+    # Load the default sentiment backend once, other backends are loaded on first use
+    try:
+        sentiment.get_backend()
+    except Exception as e:
+        # A backend that cannot load must not break the pool for clustering, its tasks retry the load and report the error
+        print(f"Error preloading the sentiment backend in worker {os.getpid()}: {type(e).__name__}: {e}")
+
+def _ready():
+    return True
+
+def _sentiment_task(commit_msgs, backend):
+    return statistics.sentiment_analysis(commit_msgs, backend)
+
+def _cluster_task(features, num_clusters, model):
+    return statistics.cluster_features(features, num_clusters, model)
+
+
+class WorkerPool:
+    '''
+    Size bounded process pool with admission control.
+
+    Parameters:
+    - workers (int): Number of worker processes.
+    - queue_size (int): Maximum number of tasks running or waiting.
+    - timeout (float): Default number of seconds to wait for a task.
+
+    Note:
+    - Worker processes are spawned by `start` (or on first use) and try to load the default sentiment backend once.
+    - A timed out task keeps its slot until the worker finishes it, so admission reflects the real load.
+    '''
+    def __init__(self, workers=POOL_WORKERS, queue_size=POOL_QUEUE_SIZE, timeout=POOL_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=_init_worker)
+            return self._executor
+
+    def start(self):
+        '''
+        Spawns the worker processes and waits for them to try loading the sentiment backend, so the first requests do not pay for it.
+        '''
+        executor = self._get_executor()
+        for future in [executor.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+
+    def run(self, fn, *args, timeout=None):
+        '''
+        Runs a task in the pool and waits for its result.
+
+        Parameters:
+        - fn (callable): Module level function to run.
+        - args: Arguments of `fn`, must be picklable.
+        - timeout (float, optional): Seconds to wait, the pool's default if omitted.
+
+        Returns:
+        - Any: The result of `fn`.
+
+        Raises:
+        - PoolSaturated: If the pool is full.
+        - PoolTimeout: If the task is not done in time or the pool is broken.
+        '''
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated("Worker pool is saturated, try again later")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._slots.release()
+            with self._lock:
+                self._executor = None
+            raise PoolTimeout(f"Worker pool unavailable: {e}")
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise PoolTimeout(f"Task did not finish within {timeout or self.timeout} seconds")
+        except BrokenProcessPool as e:
+            with self._lock:
+                self._executor = None
+            raise PoolTimeout(f"Worker pool unavailable: {e}")
+
+    def sentiment(self, commit_msgs, backend=None, timeout=None):
+        '''
+        Runs sentiment analysis on a batch of commit messages in the pool.
+
+        Parameters:
+        - commit_msgs (list): Commit messages.
+        - backend (str, optional): Name of the sentiment backend, the deployment default if omitted.
+
+        Returns:
+        - list: One sentiment dictionary per commit message.
+        '''
+        return self.run(_sentiment_task, list(commit_msgs), backend, timeout=timeout)
+
+    def cluster(self, features, num_clusters, model=None, timeout=None):
+        '''
+        Fits the developer clusters in the pool, see `statistics.cluster_features`.
+        '''
+        return self.run(_cluster_task, features, num_clusters, model, timeout=timeout)